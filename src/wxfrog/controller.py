@@ -1,9 +1,6 @@
 from collections.abc import Mapping
-from copy import deepcopy
 from importlib.resources.abc import Traversable
 from pubsub import pub
-from zipfile import ZipFile, ZIP_DEFLATED
-from json import dumps, load
 import wx
 
 from .models.engine import CalculationEngine
@@ -11,7 +8,9 @@ from .models.model import Model
 from .views.frame import FrogFrame
 from .config import Configuration
 from .events import *
-from .utils import copy_html_to_clipboard
+from .utils import copy_table_to_clipboard, CLIPBOARD_MARKUP, CLIPBOARD_ASK
+from .views.auxiliary import ExportProgressDialog
+from .views.snapshots import SnapshotExport
 from wxfrog.models.scenarios import SCENARIO_CURRENT, SCENARIO_CONVERGED
 
 
@@ -20,6 +19,8 @@ class Controller:
                  data: Mapping[str, str]):
         self.configuration = Configuration(config_directory, data)
         self._running = True  # initially busy with initialization
+        # exports share the progress events, so only one runs at a time
+        self._exporting = False
 
         # event subscriptions
         events = {
@@ -33,22 +34,31 @@ class Controller:
             OPEN_FILE: self._on_open_file,
             SAFE_FILE: self._on_save_file,
             SAFE_FILE_AS: self._on_save_file_as,
+            SAVE_FILE_DONE: self._on_save_file_done,
+            SAVE_FILE_FAILED: self._on_save_file_failed,
             EXIT_APP: self._on_exit_app,
             RUN_CASE_STUDY: self._on_run_case_study,
             CALCULATION_FAILED: self._on_calculation_failed,
             COPY_SCENARIO: self._on_copy_scenario,
             RENAME_SCENARIO: self._on_rename_scenario,
             DELETE_SCENARIO: self._on_delete_scenario,
+            OPEN_LIBRARY: self._on_open_library,
+            STORE_IN_LIBRARY: self._on_store_in_library,
+            FETCH_FROM_LIBRARY: self._on_fetch_from_library,
             OPEN_RESULTS: self._on_open_results,
             RESULT_UNIT_CLICKED: self._on_result_unit_clicked,
-            RESULT_UNIT_CHANGED: self._update_results,
+            RESULT_UNIT_CHANGED: self._on_result_unit_changed,
             CASE_STUDY_PARAMETER_SELECTED: self._on_case_study_param_sel,
             CASE_STUDY_RUN: self._on_case_study_run,
             CASE_STUDY_ENDED: self._on_case_study_ended,
             CASE_STUDY_INTERRUPT: self._on_interrupt_case_study,
             CASE_STUDY_PROPERTIES_SELECTED:
                 self._on_case_study_properties_selected,
-            COPY_STREAM_TABLE: self._on_copy_stream_table
+            COPY_STREAM_TABLE: self._on_copy_stream_table,
+            EXPORT_STREAM_TABLE: self._on_export_stream_table,
+            EXPORT_CASE_STUDY: self._on_export_case_study,
+            EXPORT_CASE_SNAPSHOTS: self._on_export_case_snapshots,
+            EXPORT_ENDED: self._on_export_ended
         }
 
         for evt_id, callback in events.items():
@@ -60,8 +70,38 @@ class Controller:
         self.frame.Show()
 
     def _on_copy_stream_table(self, name: str):
-        html = self.model.collect_stream_table(name)
-        copy_html_to_clipboard(html)
+        self._copy_table(self.model.collect_stream_table(name))
+
+    def _on_export_stream_table(self, name: str):
+        msg = "Export stream table"
+        if not self._can_export():
+            return
+        if (path := self.frame.show_export_dialog(msg)) is not None:
+            self._run_export(self.model.export_stream_table(path, name))
+
+    def _on_export_case_study(self, paths):
+        msg = "Export case study results"
+        if not self._can_export():
+            return
+        if (path := self.frame.show_export_dialog(msg)) is not None:
+            self._run_export(self.model.export_case_study(path, paths))
+
+    def _on_export_case_snapshots(self):
+        msg = "Save canvas of each case as graphics"
+        if not self._can_export():
+            return
+        path = self.frame.show_file_dialog(msg, "PNG files", "png", save=True)
+        if path is not None:
+            num_rows, cases = self.model.case_study_cases()
+            self._run_export(
+                SnapshotExport(self.frame.canvas, path, cases, num_rows),
+                "Pictures")
+
+    def _on_export_ended(self, message):
+        # called from export thread
+        wx.CallAfter(setattr, self, "_exporting", False)
+        if message is not None:
+            wx.CallAfter(self.frame.show_export_error, message)
 
     def _on_case_study_run(self, specs):
         case_study = self.model.assure_case_study()
@@ -82,8 +122,7 @@ class Controller:
         self._running = False
 
     def _on_case_study_properties_selected(self, paths):
-        html = self.model.collect_case_study_results(paths)
-        copy_html_to_clipboard(html)
+        self._copy_table(self.model.collect_case_study_results(paths))
 
     def _on_export_canvas_gfx(self):
         msg = "Save canvas as graphics"
@@ -97,6 +136,7 @@ class Controller:
         self.frame.case_study_menu_item.Enable(False)
         self.frame.case_studies.allow_run(False)
         self.frame.copy_stream_table_menu_item.Enable(False)
+        self.frame.export_stream_table_menu_item.Enable(False)
         self._running = True
 
     def _on_calculation_done(self):
@@ -110,6 +150,7 @@ class Controller:
         self.frame.case_study_menu_item.Enable()
         self.frame.case_studies.allow_run(True)
         self.frame.copy_stream_table_menu_item.Enable()
+        self.frame.export_stream_table_menu_item.Enable()
         self._running = False
 
     def _on_calculation_failed(self, message):
@@ -120,17 +161,28 @@ class Controller:
         self._running = False
 
     def _on_initialisation_done(self):
+        def start():
+            if self.model.library is not None:
+                self.frame.library_menu_item.Enable()
+                self._update_library()
+            recovered = self._offer_recovery()
+            self._update_parameters()
+            if recovered:
+                if SCENARIO_CONVERGED in self.model.scenarios:
+                    self._update_results()
+                self._update_scenarios()
+            if self.configuration.get("run_engine_on_start", False):
+                self._on_model_run()
+
         errors = self.model.finalize_initialisation()
         if errors:
             wx.CallAfter(self.frame.show_config_error_dialog, errors)
-        wx.CallAfter(self._update_parameters)
+        wx.CallAfter(start)
         self.frame.case_studies.switch_button_enable("add", True)
         self.frame.case_studies.allow_run(True)
         self.frame.run_menu_item.Enable()
         self.frame.case_study_menu_item.Enable()
         self._running = False
-        if self.configuration.get("run_engine_on_start", False):
-            self._on_model_run()
 
     def _on_open_results(self):
         self.frame.results.Show()
@@ -147,13 +199,11 @@ class Controller:
         if path is None:
             return
 
-        with ZipFile(path, "r") as zip_file:
-            with zip_file.open("data.json") as file:
-                data = load(file)
-        self.model.file_path = path
+        self.model.wait_for_save()  # the file might be the one being saved
+        param = self.model.load(path)
         self.frame.update_title(path)
-        param = self.model.deserialize(data)
         self.frame.case_studies.list_ctrl.set_parameters(param)
+        self._offer_recovery()
 
         self._update_parameters()
         self._update_results()
@@ -164,13 +214,7 @@ class Controller:
         if path is None:
             self._on_save_file_as()
             return
-        # hack to get parameters from case study from view
-        # (I know, it breaks MVC, to be changed later)
-        param = self.frame.case_studies.list_ctrl.get_parameters()
-        data = self.model.serialize(param)
-        json = dumps(data, indent=2, ensure_ascii=False)
-        with ZipFile(path, "w", compression=ZIP_DEFLATED) as file:
-            file.writestr("data.json", json)
+        self._save_file(path)
 
     def _on_save_file_as(self):
         msg = "Save file"
@@ -178,12 +222,22 @@ class Controller:
         ending = self.configuration["file_ending"]
         path = self.frame.show_file_dialog(msg, app_name, ending, save=True)
         if path is not None:
-            self.model.file_path = path
-            self._on_save_file()
-            self.frame.update_title(path)
+            self._save_file(path)
+
+    def _on_save_file_done(self, path: str):
+        # called from saving thread
+        wx.CallAfter(self.model.finish_saves)
+        wx.CallAfter(self.frame.update_title, path)
+        wx.CallAfter(self.frame.set_status, f"Saved {path}")
+
+    def _on_save_file_failed(self, path: str, message: str):
+        # called from saving thread
+        wx.CallAfter(self.model.finish_saves)
+        wx.CallAfter(self.frame.show_save_error, path, message)
 
     def _on_exit_app(self, event):
         # may ask to save file
+        self.model.close()
         event.Skip()
 
     def _on_run_case_study(self):
@@ -193,12 +247,12 @@ class Controller:
     def _on_show_parameter(self, item):
         scn_current = self.model.scenarios[SCENARIO_CURRENT]
         param = scn_current.parameters
-        value = param.get(item["path"])
+        value = param.get(item.path)
         units = self.model.compatible_units(value)
         new_value = self.frame.canvas.show_parameter_dialog(item, value, units)
         if new_value is None or new_value == value:
             return
-        scn_current.set_param(item["path"], new_value)
+        self.model.set_param(SCENARIO_CURRENT, item.path, new_value)
         self.frame.canvas.update_parameters(param)
         if (self.configuration.get("run_engine_on_change", False)
                 and not self._running):
@@ -208,28 +262,42 @@ class Controller:
         self.model.register_unit(unit)
 
     def _on_copy_scenario(self, source: str, target: str):
-        scenarios = self.model.scenarios
-        scenarios[target] = deepcopy(scenarios[source])
+        self.model.copy_scenario(source, target)
         if target == SCENARIO_CURRENT:
             self._update_parameters()
             self._update_results()
         self._update_scenarios()
 
     def _on_rename_scenario(self, source: str, target: str):
-        scenarios = self.model.scenarios
-        scenarios[target] = scenarios[source]
-        del scenarios[source]
+        self.model.rename_scenario(source, target)
         self._update_scenarios()
 
     def _on_delete_scenario(self, name: str):
-        scenarios = self.model.scenarios
-        del scenarios[name]
+        self.model.delete_scenario(name)
+        self._update_scenarios()
+
+    def _on_open_library(self):
+        self._update_library()
+        self.frame.library.Show()
+
+    def _on_store_in_library(self, source: str, target: str):
+        self.model.store_in_library(source, target)
+        self._update_library()
+
+    def _on_fetch_from_library(self, source: str, target: str):
+        self.model.fetch_from_library(source, target)
         self._update_scenarios()
+        self._update_library()
 
     def _on_result_unit_clicked(self, item, value):
         units = self.model.compatible_units(value)
         self.frame.results.view_ctrl.change_unit(item, units)
 
+    def _on_result_unit_changed(self):
+        # units are changed in place, so the scenario needs to be saved again
+        self._displayed_scenario().touch()
+        self._update_results()
+
     def _on_case_study_param_sel(self, path):
         param_info = self.model.get_param_info(path)
         self.frame.case_studies.list_ctrl.add(param_info)
@@ -240,6 +308,46 @@ class Controller:
         self.frame.canvas.update_parameters(
             self.model.scenarios[SCENARIO_CURRENT].parameters)
 
+    def _offer_recovery(self) -> bool:
+        # replay changes that were not saved before a crash on user request
+        if num := self.model.recoverable_changes():
+            if self.frame.ask_recovery(num):
+                self.model.recover()
+                return True
+            self.model.discard_recovery()
+        return False
+
+    def _copy_table(self, table):
+        fmt = self.configuration.get("clipboard_format", CLIPBOARD_MARKUP)
+        if fmt == CLIPBOARD_ASK:
+            if (fmt := self.frame.ask_clipboard_format()) is None:
+                return
+        copy_table_to_clipboard(table, fmt)
+
+    def _can_export(self) -> bool:
+        if self._exporting:
+            self.frame.show_export_error(
+                "Another export is still running. Please wait for it to "
+                "finish, or cancel it.")
+        return not self._exporting
+
+    def _run_export(self, export, what: str = "Rows"):
+        self._exporting = True
+        ExportProgressDialog(export.num_rows, export.interrupt, what)
+        export.run()
+
+    def _save_file(self, path):
+        # hack to get parameters from case study from view
+        # (I know, it breaks MVC, to be changed later)
+        param = self.frame.case_studies.list_ctrl.get_parameters()
+        self.frame.set_status(f"Saving {path} ...")
+        self.model.save(path, param)
+
+    def _displayed_scenario(self):
+        scn = self.model.scenarios
+        current = scn[SCENARIO_CURRENT].has_results()
+        return scn[SCENARIO_CURRENT if current else SCENARIO_CONVERGED]
+
     def _update_results(self):
         scn = self.model.scenarios
         current = scn[SCENARIO_CURRENT].has_results()
@@ -247,6 +355,12 @@ class Controller:
         self.frame.canvas.update_results(scn[which].results, current)
         self.frame.results.view_ctrl.set_data(scn[which].results)
 
+    def _update_library(self):
+        entries = self.model.library.entries()
+        self.frame.scenarios.library_names = {e.name for e in entries}
+        custom = {n for n in self.model.scenarios if not n.startswith("*")}
+        self.frame.library.update(entries, custom)
+
     def _update_scenarios(self):
         scn = {name: (s.has_results(), s.mod_local_time())
                for name, s in self.model.scenarios.items()}
@@ -14,9 +14,16 @@ COPY_STREAM_TABLE = "COPY_STREAM_TABLE"
 DELETE_SCENARIO = "DELETE_SCENARIO"
 EXIT_APP = "EXIT_APP"
 EXPORT_CANVAS_GFX = "EXPORT_CANVAS_GFX"
+EXPORT_CASE_SNAPSHOTS = "EXPORT_CASE_SNAPSHOTS"
+EXPORT_CASE_STUDY = "EXPORT_CASE_STUDY"
+EXPORT_ENDED = "EXPORT_ENDED"
+EXPORT_PROGRESS = "EXPORT_PROGRESS"
+EXPORT_STREAM_TABLE = "EXPORT_STREAM_TABLE"
+FETCH_FROM_LIBRARY = "FETCH_FROM_LIBRARY"
 INITIALIZATION_DONE = "INITIALIZATION_DONE"
 NEW_UNIT_DEFINED = "NEW_UNIT_DEFINED"
 OPEN_FILE = "OPEN_FILE"
+OPEN_LIBRARY = "OPEN_LIBRARY"
 OPEN_RESULTS = "OPEN_RESULTS"
 OPEN_SCENARIOS = "OPEN_SCENARIOS"
 RENAME_SCENARIO = "RENAME_SCENARIO"
@@ -26,4 +33,7 @@ RUN_CASE_STUDY = "RUN_CASE_STUDY"
 RUN_MODEL = "RUN_MODEL"
 SAFE_FILE = "SAFE_FILE"
 SAFE_FILE_AS = "SAFE_FILE_AS"
+SAVE_FILE_DONE = "SAVE_FILE_DONE"
+SAVE_FILE_FAILED = "SAVE_FILE_FAILED"
 SHOW_PARAMETER_IN_CANVAS = "SHOW_PARAMETER_IN_CANVAS"
+STORE_IN_LIBRARY = "STORE_IN_LIBRARY"
@@ -1,18 +1,23 @@
-from typing import Optional
-from collections.abc import Sequence
+from typing import Optional, Self
+from collections.abc import Sequence, Iterator
 from dataclasses import dataclass, KW_ONLY, field
 from threading import Thread, Lock
 from time import sleep
-from itertools import product
+from itertools import product, islice
 from copy import deepcopy
-from math import log, ceil
+from math import log, ceil, nan, isnan
+from array import array
+from sys import byteorder
 
 from pubsub import pub
 from pint.registry import Quantity  # actual type
 
-from wxfrog.utils import DataStructure, get_unit_registry
+from wxfrog.utils import (
+    DataStructure, get_unit_registry, get_path_table, format_unit,
+    parse_unit, JSONType)
 from .engine import CalculationEngine, CalculationFailed
 from .html import HtmlTable
+from .export import TableExport
 from .scenarios import Scenario
 from ..events import CALCULATION_FAILED, CASE_STUDY_ENDED, CASE_STUDY_PROGRESS
 from ..utils import Path
@@ -103,23 +108,100 @@ class ParameterSpec:
 class CaseStudyResults:
     def __init__(self, param_paths: Sequence[Path],
                  result_paths: Sequence[Path]):
-        self.param_columns = param_paths
-        self.result_columns = result_paths
-        self.params: list[Sequence[Quantity]] = []
-        self.results: list[Sequence[Quantity]] = []
+        table = get_path_table()
+        self.param_columns = [table.intern(p) for p in param_paths]
+        self.result_columns = [table.intern(p) for p in result_paths]
+        # magnitudes are stored column-wise, in the unit of the first case
+        self.param_units: list[str] = []
+        self.result_units: list[str] = []
+        self.params: list[Sequence[float]] = [
+            array("d") for _ in self.param_columns]
+        self.results: list[Sequence[float]] = [
+            array("d") for _ in self.result_columns]
+        self.num_rows = 0
+        self._buffer: Optional[memoryview] = None
 
     def add_result(self, params: DataStructure, results: DataStructure):
-        self.params.append([params.get(p) for p in self.param_columns])
-        self.results.append([results.get(p) for p in self.result_columns])
+        def get(data, path, unit):
+            try:
+                return data.get(path).m_as(unit)
+            except KeyError:
+                return nan
+
+        if not self.num_rows:
+            self.param_units = [str(params.get(p).u)
+                                for p in self.param_columns]
+            self.result_units = [str(results.get(p).u)
+                                 for p in self.result_columns]
+        for c, p, u in zip(self.params, self.param_columns, self.param_units):
+            c.append(get(params, p, u))
+        for c, p, u in zip(self.results, self.result_columns,
+                           self.result_units):
+            c.append(get(results, p, u))
+        self.num_rows += 1
+
+    def schema(self, rows: int = None) -> JSONType:
+        """Return the description of the columns and their raw data as
+        provided by :meth:`data`, whereas ``rows`` limits the number of
+        cases."""
+        def columns(paths, units):
+            return [{"path": list(p), "unit": u} for p, u in zip(paths, units)]
 
-    def collect(self, filename: str, paths: Sequence[Path]) -> str:
+        return {
+            "rows": self.num_rows if rows is None else rows,
+            "byteorder": byteorder,
+            "params": columns(self.param_columns, self.param_units),
+            "results": columns(self.result_columns, self.result_units)
+        }
+
+    def data(self, rows: int = None) -> bytes:
+        """Return the raw data of all columns as consecutive arrays of
+        doubles, parameters first. Columns are only appended to, so this can
+        be called in another thread while the study is still running."""
+        n = self.num_rows if rows is None else rows
+        return b"".join(c[:n].tobytes() for c in self.params + self.results)
+
+    @classmethod
+    def from_buffer(cls, schema: JSONType, buffer: memoryview) -> Self:
+        """Create results from the schema and raw data as provided by
+        :meth:`schema` and :meth:`data`. The columns are views into the buffer, such that
+        a memory-mapped buffer is not read before the data is used."""
+        params, results = schema["params"], schema["results"]
+        result = cls([c["path"] for c in params], [c["path"] for c in results])
+        result.param_units = [c["unit"] for c in params]
+        result.result_units = [c["unit"] for c in results]
+        n = result.num_rows = schema["rows"]
+        data = buffer.cast("d")
+        if schema["byteorder"] != byteorder:
+            (data := array("d", data)).byteswap()
+        columns = [data[k * n:(k + 1) * n]
+                   for k in range(len(params) + len(results))]
+        result.params = columns[:len(params)]
+        result.results = columns[len(params):]
+        result._buffer = buffer
+        return result
+
+    def detach(self):
+        """Copy columns that are views into a buffer into own arrays, and
+        release the buffer."""
+        def copy(column):
+            (result := array("d")).frombytes(column)
+            return result
+
+        if self._buffer is None:
+            return
+        self.params = [copy(c) for c in self.params]
+        self.results = [copy(c) for c in self.results]
+        self._buffer = None
+
+    def collect(self, filename: str, paths: Sequence[Path]) -> HtmlTable:
         mask = self._filter_properties(paths)
         param_names = [".".join(p) for p in self.param_columns]
-        param_units = [str(p.u) for p in self.params[0]]
+        param_units = self.param_units
         prop_names = [".".join(p)
                       for p, m in zip(self.result_columns, mask) if m]
-        prop_units = [str(p.u) for p, m in zip(self.results[0], mask) if m]
-        row_labels = list(map(str, range(1, len(self.results) + 1)))
+        prop_units = [u for u, m in zip(self.result_units, mask) if m]
+        row_labels = list(map(str, range(1, self.num_rows + 1)))
         table = HtmlTable(param_names + prop_names, row_labels)
         table.label = "Case study"
         table.title = "Unnamed" if filename is None else filename
@@ -127,13 +209,58 @@ class CaseStudyResults:
         table.add_vertical_line(len(param_names) - 1)
         table.set_top_rect_headers([["Parameter"], ["Unit"]])
 
-        data = [
-            [pa.m for pa in param_row] +
-            [pr.m for pr, m in zip(prop_row, mask) if m]
-            for param_row, prop_row in zip(self.params, self.results)
-        ]
-        table.set_data(data)
-        return table.render()
+        columns = self.params + [c for c, m in zip(self.results, mask) if m]
+        table.set_columns([c[:self.num_rows] for c in columns])
+        return table
+
+    def export(self, path: str, paths: Sequence[Path]) -> TableExport:
+        """Return an export of the parameters and the selected properties
+        into a csv or tsv file. The rows are read from the columns while
+        writing, so the export does not copy the results."""
+        mask = self._filter_properties(paths)
+        names = [".".join(p) for p in self.param_columns]
+        names += [".".join(p) for p, m in zip(self.result_columns, mask) if m]
+        units = self.param_units + [u for u, m in
+                                    zip(self.result_units, mask) if m]
+        units = [format_unit(u, "~") for u in units]
+        columns = self.params + [c for c, m in zip(self.results, mask) if m]
+        n = self.num_rows  # the case study might still be running
+        rows = islice(zip(*columns), n)
+        row_headers = ([str(k)] for k in range(1, n + 1))
+        headers = [["Case"] + names, [""] + units]
+        return TableExport(path, headers, rows, n, row_headers)
+
+    def cases(self, parameters: DataStructure, rows: int = None
+              ) -> Iterator[tuple[DataStructure, DataStructure]]:
+        """Yield the parameters and results of each case. Parameters that are
+        not varied are taken from ``parameters``. Like for :meth:`collect`,
+        only successful cases are included, and results not obtained for a
+        case are missing. To avoid copying, the same structures are updated
+        and yielded for all cases, so they are only valid until the next
+        case."""
+        def leaves(structure, paths, data, units):
+            # the parent node and key of each column's leaf
+            result = []
+            for path, column, unit in zip(paths, data, units):
+                node = structure
+                for p in path[:-1]:
+                    node = node.setdefault(p, {})
+                result.append((node, path[-1], column, parse_unit(unit)))
+            return result
+
+        qty_cls = get_unit_registry().Quantity
+        params, results = parameters.copy_tree(), DataStructure()
+        columns = leaves(params, self.param_columns, self.params,
+                         self.param_units)
+        columns += leaves(results, self.result_columns, self.results,
+                          self.result_units)
+        for k in range(self.num_rows if rows is None else rows):
+            for node, key, column, unit in columns:
+                if isnan(value := column[k]):
+                    node.pop(key, None)
+                else:
+                    node[key] = qty_cls(value, unit)
+            yield params, results
 
     def _filter_properties(self, paths):
         def matches(column, path):
@@ -163,42 +290,43 @@ class CaseStudy:
         self.scenario = scenario
         self._interrupt = False
 
-    def serialize(self, parameters):
+    @staticmethod
+    def serialize_parameters(parameters):
         def serialize_param(p):
             p = dict(p)
             p["spec"] = p["spec"].serialize()
             p["min"] = f"{p['min']:.14g~}"
             p["max"] = f"{p['max']:.14g~}"
-            p["units"] = list(p["units"])
+            p["units"] = sorted(p["units"])
             return p
 
-        return {
-            "scenario": self.scenario.serialize(),
-            "parameters": list(map(serialize_param, parameters))
-        }
+        return list(map(serialize_param, parameters))
 
     @classmethod
-    def deserialize(cls, engine, outstream, data):
+    def deserialize(cls, engine, outstream, scenario: Scenario, data):
+        """Create the case study, based on given scenario and the serialized
+        parameters. Return the case study and the parameter information as
+        used by the view."""
         def deserialize_param(p):
             return {
                 "spec": ParameterSpec.deserialize(p["spec"]),
                 "min": qty_cls(p["min"]),
-                "max": qty_cls(p["min"]),
+                "max": qty_cls(p["max"]),
                 "units": set(p["units"])
             }
 
-        if data is None:
-            return None
         qty_cls = get_unit_registry().Quantity
-        scenario = Scenario.deserialize(data["scenario"])
         result = cls(engine, scenario, outstream)
-        params = [deserialize_param(p) for p in data["parameters"]]
+        params = [deserialize_param(p) for p in data]
         result.param_specs = [p["spec"] for p in params]
         return result, params
 
-    def collect(self, filename: str, paths: Sequence[Path]) -> str:
+    def collect(self, filename: str, paths: Sequence[Path]) -> HtmlTable:
         return self.results.collect(filename, paths)
 
+    def export(self, path: str, paths: Sequence[Path]) -> TableExport:
+        return self.results.export(path, paths)
+
     def set_parameters(self, specs: Sequence[ParameterSpec]):
         self.param_specs = specs
         self.results = None
@@ -0,0 +1,96 @@
+from collections.abc import Iterable, Sequence, Callable
+from csv import writer
+from itertools import islice
+from locale import localeconv
+from math import isfinite
+from threading import Thread, Lock
+
+from pubsub import pub
+
+from ..events import EXPORT_PROGRESS, EXPORT_ENDED
+
+CHUNK_SIZE = 1000  # rows written at once
+DIGITS = 12
+
+
+def separator(path: str) -> str:
+    """Return the field separator for the given file name. Tab separated
+    files end on ``.tsv``, while the separator of comma separated files is
+    a semicolon if the locale uses the comma as decimal point."""
+    if path.lower().endswith(".tsv"):
+        return "\t"
+    return ";" if localeconv()["decimal_point"] == "," else ","
+
+
+def number_formatter(digits: int = DIGITS) -> Callable[[float], str]:
+    """Return a function to format a number with the decimal point of the
+    current locale, and non-finite values as empty string"""
+    dp = localeconv()["decimal_point"]
+    spec = f".{digits}g"
+
+    def fmt(value: float) -> str:
+        if not isfinite(value):
+            return ""
+        return format(value, spec).replace(".", dp)
+
+    def fmt_plain(value: float) -> str:
+        return format(value, spec) if isfinite(value) else ""
+
+    return fmt_plain if dp == "." else fmt
+
+
+class TableExport:
+    """Write a table to a csv or tsv file in a background thread.
+
+    The ``rows`` iterable is consumed chunk-wise, such that only one chunk of
+    formatted rows is in memory at a time. Progress is published via
+    ``EXPORT_PROGRESS`` after each chunk, and ``EXPORT_ENDED`` is sent at the
+    end, with an error message if the export failed.
+    """
+    def __init__(self, path: str, headers: Sequence[Sequence[str]],
+                 rows: Iterable[Sequence[float]], num_rows: int,
+                 row_headers: Iterable[Sequence[str]] = None):
+        self.path = path
+        self.num_rows = num_rows
+        self._headers = headers
+        self._rows = rows
+        self._row_headers = row_headers
+        self._lock = Lock()
+        self._interrupt = False
+
+    def run(self):
+        Thread(target=self._run, daemon=True).start()
+
+    def interrupt(self):
+        with self._lock:
+            self._interrupt = True
+
+    def write(self):
+        """Write the file in the calling thread"""
+        fmt = number_formatter()
+        rows = iter(self._rows)
+        row_headers = iter(self._row_headers or [])
+        # with byte order mark, so spreadsheet programs detect utf-8
+        with open(self.path, "w", newline="", encoding="utf-8-sig") as file:
+            out = writer(file, delimiter=separator(self.path))
+            out.writerows(self._headers)
+            k = 0
+            while chunk := list(islice(rows, CHUNK_SIZE)):
+                out.writerows(
+                    [*next(row_headers, ()), *map(fmt, row)] for row in chunk)
+                k += len(chunk)
+                pub.sendMessage(EXPORT_PROGRESS, k=k)
+                with self._lock:
+                    if self._interrupt:
+                        break
+
+    def _run(self):
+        try:
+            self.write()
+        except OSError as error:
+            pub.sendMessage(EXPORT_ENDED, message=str(error))
+        except Exception as error:  # the dialog must be closed in any case
+            message = f"{type(error).__name__}: {error}"
+            pub.sendMessage(EXPORT_ENDED, message=message)
+        else:
+            pub.sendMessage(EXPORT_ENDED, message=None)
@@ -1,11 +1,10 @@
-from math import isfinite
-from collections.abc import Sequence
-from datetime import datetime
+from collections.abc import Iterator
 from html import escape
-from locale import setlocale, localeconv, LC_ALL
-from ..utils import get_unit_registry
+from io import StringIO
+from itertools import islice
+from typing import TextIO
 
-setlocale(LC_ALL, "")
+from .table import Table, CHUNK_ROWS
 
 _SHELL = """
     <table style="border-collapse: collapse;">
@@ -31,108 +30,51 @@ _HTML_REPLACEMENTS = [
     ("±", "&plusmn;"), ("Ω", "&Omega;"),  ("ω", "&omega;"),  ("Δ", "&Delta;"),
     ("δ", "&delta;"), ("σ", "&sigma;"), ("Å", "&Aring;")]
 
+
+def html_entities(text: str) -> str:
+    """Replace unicode characters as used by units of measurement by their
+    html entities"""
+    for fr, to in _HTML_REPLACEMENTS:
+        text = text.replace(fr, to)
+    return text
+
+
 def recode(entity):
     result = escape(entity)
     return result.encode("ascii", "xmlcharrefreplace").decode("ascii")
 
 
-class HtmlTable:
+class HtmlTable(Table):
     HEADER_BG_COLOR = "#cccccc"
     ROW_BG_COLORS = [None, "#eeeeee"]
+    UNIT_SPEC = "H~"
+
+    def render(self) -> str:
+        result = StringIO()
+        self.render_to(result)
+        return result.getvalue()
 
-    def __init__(self, column_headers: Sequence[str],
-                 row_headers: Sequence[str],
-                 default_digits=6):
-        self.label = "Simulation"
-        self.title = ""
-        self.date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self._column_headers = [column_headers]
-        self._top_rect_headings = None
-        self._row_headers = [row_headers]
-        self._vertical_lines = set()
-        self._row_format = {}
-        self._col_format = {}
-        self._default_digits = default_digits
-        self._data = None
-        self._threshold = [0.0] * len(row_headers)
-        self._nan = [""] * len(row_headers)
-        self._sub_threshold = [""] * len(row_headers)
-
-    def add_column_header_row(self, row: Sequence[str]):
-        assert len(row) == len(self._column_headers[0])
-        self._column_headers.append(row)
-
-    def add_row_header_column(self, column: Sequence[str]):
-        assert len(column) == len(self._row_headers[0])
-        self._row_headers.append(column)
-
-    def add_vertical_line(self, column: int):
-        self._vertical_lines.add(column)
-
-    def add_row_unit_column(self, units: Sequence[str]):
-        assert len(units) == len(self._row_headers[0])
-        u_cls = get_unit_registry().Unit
-        formatted = [f"{u_cls(u):H~}" for u in units]
-        self.add_row_header_column(formatted)
-
-    def add_column_unit_row(self, units: Sequence[str]):
-        assert len(units) == len(self._column_headers[0])
-        u_cls = get_unit_registry().Unit
-        formatted = [f"{u_cls(u):H~}" for u in units]
-        self.add_column_header_row(formatted)
-
-    def set_top_rect_headers(self, headings: Sequence[Sequence[str]]):
-        self._top_rect_headings = headings
-
-    def set_row_format(self, row: int, fmt: str):
-        self._row_format[row] = fmt
-
-    def set_col_format(self, col: int, fmt: str):
-        self._col_format[col] = fmt
-
-    def set_threshold(self, row, threshold: float):
-        assert threshold >= 0.0
-        self._threshold[row] = threshold
-
-    def set_nan(self, row, nan_string: str):
-        self._nan[row] = nan_string
-
-    def set_sub_threshold(self, row, sub_threshold_string: str):
-        self._sub_threshold[row] = sub_threshold_string
-
-    def set_data(self, data: Sequence[Sequence[float]]):
-        def fmt(row: int, col: int, value: float):
-            if not isfinite(value):
-                return self._nan[row]
-            if abs(value) < self._threshold[row]:
-                return self._sub_threshold[row]
-
-            f = self._row_format.get(row, "{x:.{d}g}")
-            f = self._col_format.get(col, f)
-            res = f.format(x=value, d=self._default_digits)
-            return res.replace(".", dp)
-
-        assert len(data) == len(self._row_headers[0])
-        for d_r in data:
-            assert len(d_r) == len(self._column_headers[0])
-        dp = localeconv()["decimal_point"]
-        self._data = [[fmt(r, c, d) for c, d in enumerate(d_r)]
-                      for r, d_r in enumerate(data)]
-
-    def render(self):
+    def render_to(self, file: TextIO, chunk_rows: int = CHUNK_ROWS):
+        """Write the html table into ``file``, holding only ``chunk_rows``
+        rendered rows in memory at a time"""
+        for chunk in self.iter_render(chunk_rows):
+            file.write(chunk)
+
+    def iter_render(self, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+        """Yield the html table in chunks of ``chunk_rows`` rows"""
         assert self._data is not None
-        headers = self._generate_headers()
-        rows = self._generate_rows()
-        columns = self._generate_columns()
-        table = f"{headers}{rows}"
-        result = _SHELL.format(
-            label=self.label, title=self.title, date=self.date,
-            columns=columns, table=table)
-
-        # replace unicode entities from units of measurement
-        for fr, to in _HTML_REPLACEMENTS:
-            result = result.replace(fr, to)
-        return result
+        head, tail = _SHELL.split("{table}")
+        # unicode entities from units of measurement are replaced in the
+        # header cells and texts, not in the entire document.
+        yield head.format(
+            label=html_entities(self.label), title=html_entities(self.title),
+            date=self.date, columns=self._generate_columns())
+        yield self._generate_headers()
+        rows, separator = self._generate_rows(), ""
+        while chunk := list(islice(rows, chunk_rows)):
+            yield separator + "\n".join(chunk)
+            separator = "\n"
+        yield tail
 
     def _generate_columns(self):
         def style(k):
@@ -146,26 +88,35 @@ class HtmlTable:
         ])
         return "".join(cols)
 
-    def _generate_rows(self):
-        rows = []
-        for k, row_h in enumerate(zip(*self._row_headers)):
-            row_hh = "".join(_HEADING_CELL.format(heading=c) for c in row_h)
-            data = "".join(_CELL.format(content=d) for d in self._data[k])
+    def _generate_rows(self) -> Iterator[str]:
+        # Data cells only contain unicode entities if the format or the
+        # texts for special values do, so mostly they need no replacement.
+        texts = [*self._row_format.values(), *self._col_format.values(),
+                 *self._nan, *self._sub_threshold]
+        if any(html_entities(t) != t for t in texts):
+            data_rows = ([html_entities(d) for d in r] for r in self._data)
+        else:
+            data_rows = iter(self._data)
+        row_headers = zip(*self.row_header_columns(self.UNIT_SPEC))
+        for k, (row_h, d_r) in enumerate(zip(row_headers, data_rows)):
+            row_hh = "".join(_HEADING_CELL.format(heading=html_entities(c))
+                             for c in row_h)
+            data = "".join(_CELL.format(content=d) for d in d_r)
             bg_col = self.ROW_BG_COLORS[k % len(self.ROW_BG_COLORS)]
-            rows.append(_ROW.format(bg_col=bg_col, row_hh=row_hh, data=data))
-        return "\n".join(rows)
+            yield _ROW.format(bg_col=bg_col, row_hh=row_hh, data=data)
 
     def _generate_headers(self):
         rows = []
         last_k = len(self._column_headers) - 1
-        top = ([[""] * len(self._row_headers)] * len(self._column_headers)
-               if self._top_rect_headings is None else self._top_rect_headings)
+        top = self.top_rect_headings()
         assert len(top) == len(self._column_headers)
-        for k, r in enumerate(self._column_headers):
+        for k, r in enumerate(self.column_header_rows(self.UNIT_SPEC)):
             left_hd = top[k]
             assert len(left_hd) == len(self._row_headers)
-            row_hh = "".join(_HEADING_CELL.format(heading=c) for c in left_hd)
-            headers = "".join(_HEADING_CELL.format(heading=c) for c in r)
+            row_hh = "".join(_HEADING_CELL.format(heading=html_entities(c))
+                             for c in left_hd)
+            headers = "".join(_HEADING_CELL.format(heading=html_entities(c))
+                              for c in r)
             border = _BOTTOM_BORDER_STYLE if k == last_k else ""
             rows.append(_HEADING.format(
                 border=border, bg_col=self.HEADER_BG_COLOR,
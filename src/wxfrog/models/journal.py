@@ -0,0 +1,344 @@
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Sequence, MutableMapping
+from json import dumps, loads, JSONDecodeError
+from os import remove, replace, stat, fstat
+from os.path import exists
+from threading import Lock
+from typing import Optional, TextIO
+
+try:
+    from fcntl import flock, LOCK_EX, LOCK_NB
+except ImportError:  # Windows
+    from msvcrt import locking, LK_NBLCK
+    flock = None
+
+from ..utils import DataStructure, JSONType, Path, get_unit_registry
+from .scenarios import SCENARIO_CURRENT, SCENARIO_CONVERGED
+
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+COMPACT_THRESHOLD = 1000
+
+# A record is a json object with an "op" entry, being one of:
+OP_SET_PARAM = "set_param"  # scenario, path, value, modified
+OP_COPY = "copy"  # source, target
+OP_RENAME = "rename"  # source, target
+OP_DELETE = "delete"  # name
+OP_CONVERGED = "converged"  # modified, parameters, results
+OP_LIBRARY = "library"  # source (in library), target, scenario (serialized)
+
+Changes = list[tuple[Path, Optional[str]]]
+
+
+def fmt_value(value) -> str:
+    return f"{value:.14g~}"
+
+
+def diff(old: Optional[DataStructure], new: DataStructure) -> Changes:
+    """Return the changes from ``old`` to ``new`` as pairs of path and
+    serialized value, with ``None`` as value for removed paths."""
+    def lookup(structure, path):
+        try:
+            return structure.get(path)
+        except (KeyError, TypeError):
+            return None
+
+    if old is None:
+        old = DataStructure()
+    result = []
+    for path in new.all_paths:
+        value, previous = new.get(path), lookup(old, path)
+        if previous is None or not previous == value:
+            result.append((path, fmt_value(value)))
+    result += [(p, None) for p in old.all_paths if lookup(new, p) is None]
+    return result
+
+
+def patch(structure: DataStructure, changes: Sequence[Sequence]):
+    """Apply changes as obtained by :func:`diff` to ``structure``"""
+    def remove_path(node: MutableMapping, path):
+        if len(path) > 1:
+            child = node[path[0]] if path[0] in node else None
+            if not isinstance(child, MutableMapping):
+                return
+            remove_path(child, path[1:])
+            if not child:
+                del node[path[0]]
+        else:
+            node.pop(path[0], None)
+
+    qty_cls = get_unit_registry().Quantity
+    for path, value in changes:
+        if value is None:
+            remove_path(structure, path)
+            continue
+        node = structure
+        for p in path[:-1]:
+            node = node.setdefault(p, {})
+        node[path[-1]] = qty_cls(value)
+
+
+def compact(records: Sequence[JSONType]) -> list[JSONType]:
+    """Return a possibly shorter list of records with the same effect.
+
+    Parameter edits are dropped if the same parameter of the same scenario is
+    set again later, and subsequent converged results are merged into the
+    last one. Copying, renaming and deleting scenarios acts as a barrier for
+    the scenarios involved.
+    """
+    result = []
+    overwritten = defaultdict(set)  # scenario -> paths set later
+    converged = None  # the latest converged record, if not behind a barrier
+    for record in reversed(records):
+        op = record["op"]
+        if op == OP_SET_PARAM:
+            paths, path = overwritten[record["scenario"]], tuple(record["path"])
+            if path in paths:
+                continue
+            paths.add(path)
+        elif op == OP_CONVERGED:
+            if converged is not None:
+                merged = {tuple(p): v for p, v in record["results"]}
+                merged.update((tuple(p), v) for p, v in converged["results"])
+                converged["results"] = [[list(p), v]
+                                        for p, v in merged.items()]
+                continue
+            converged = record = dict(record)
+            overwritten.pop(SCENARIO_CURRENT, None)
+            overwritten.pop(SCENARIO_CONVERGED, None)
+        else:
+            names = [record["name"]] if op == OP_DELETE else \
+                [record["source"], record["target"]]
+            for name in names:
+                overwritten.pop(name, None)
+            if SCENARIO_CONVERGED in names:
+                converged = None
+        result.append(record)
+    return result[::-1]
+
+
+def read_journal(path: str) -> list[JSONType]:
+    """Return the records of the journal at ``path``. A last line that was
+    not completely written before a crash is ignored."""
+    if not exists(path):
+        return []
+    result = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                result.append(loads(line))
+            except JSONDecodeError:
+                break
+    return result
+
+
+class FileLock:
+    """Lock against other processes, held as long as the lock file at
+    ``path`` is open, such that the operating system releases it if the
+    process crashes. The lock file is removed when released."""
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = None
+
+    def acquire(self) -> bool:
+        """Try to get the lock, and return whether that succeeded"""
+        while True:
+            file = open(self.path, "a")
+            try:
+                if flock is None:
+                    locking(file.fileno(), LK_NBLCK, 1)
+                else:
+                    flock(file.fileno(), LOCK_EX | LOCK_NB)
+            except OSError:
+                file.close()
+                return False
+            if flock is None or self._is_current(file):
+                self._file = file
+                return True
+            file.close()  # the file was removed by its holder meanwhile
+
+    def release(self):
+        if self._file is None:
+            return
+        if flock is not None:
+            remove(self.path)  # while locked, so nobody else gets it
+            self._file.close()
+        else:
+            self._file.close()  # open files can't be removed on Windows
+            try:
+                remove(self.path)
+            except OSError:
+                pass  # just acquired by another process
+        self._file = None
+
+    def _is_current(self, file) -> bool:
+        try:
+            return stat(self.path).st_ino == fstat(file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+
+class Journal:
+    """Append-only log of changes made since the project was last saved.
+
+    Each record is written as one line of json and flushed right away, such
+    that the changes survive a crash of the process. Once the number of
+    records exceeds a threshold, the journal is compacted. Records that are
+    contained in a completed save are removed via :meth:`mark` and
+    :meth:`truncate`.
+
+    The file is only created with the first record. Records left by a
+    previous session are overwritten by then, unless adopted by :meth:`load`.
+
+    A journal opened via :meth:`open_free` is locked against other processes,
+    which thereby never adopt or remove it while it is in use.
+    """
+    def __init__(self, path: str, threshold: int = COMPACT_THRESHOLD,
+                 file_lock: FileLock = None):
+        self.path = path
+        self._file_lock = file_lock
+        self._lock = Lock()
+        self._records: list[tuple[int, JSONType]] = []  # sequence, record
+        self._next = 0
+        self._marks = set()
+        self._file: Optional[TextIO] = None
+        self._append = False
+        self._threshold = self._limit = threshold
+
+    def __len__(self):
+        return len(self._records)
+
+    @classmethod
+    def open_free(cls, stem: str) -> "Journal":
+        """Return the journal for files starting with ``stem``, being the
+        first of ``<stem>.journal``, ``<stem>.2.journal``, and so on, that
+        is not in use by another process"""
+        path, file_lock = _free_path(stem)
+        return cls(path, file_lock=file_lock)
+
+    @classmethod
+    def path_of(cls, stem: str, k: int) -> str:
+        """Return the path of the ``k``-th journal, counting from one, for
+        files starting with ``stem``"""
+        return f"{stem}{JOURNAL_SUFFIX}" if k == 1 else \
+            f"{stem}.{k}{JOURNAL_SUFFIX}"
+
+    def load(self) -> list[JSONType]:
+        """Adopt and return the records left by a previous session"""
+        with self._lock:
+            records = read_journal(self.path)
+            self._records = []
+            for record in records:
+                self._records.append((self._next, record))
+                self._next += 1
+            self._append = True
+            return records
+
+    def append(self, record: JSONType):
+        with self._lock:
+            if self._file is None:
+                mode = "a" if self._append else "w"
+                self._file = open(self.path, mode, encoding="utf-8")
+                self._append = True
+            self._file.write(dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._records.append((self._next, record))
+            self._next += 1
+            if len(self._records) > self._limit:
+                self._compact()
+
+    def mark(self) -> int:
+        """Return a mark for the current end of the journal, to be passed
+        to :meth:`truncate` or :meth:`release` later"""
+        with self._lock:
+            self._marks.add(self._next)
+            return self._next
+
+    def truncate(self, mark: int, stem: str = None):
+        """Remove all records before ``mark``, as they are saved now. If
+        given, the remaining records move to the journal of files starting
+        with ``stem``, see :meth:`open_free`."""
+        with self._lock:
+            self._marks.discard(mark)
+            self._records = [(s, r) for s, r in self._records if s >= mark]
+            if stem is not None and self._file_lock is not None:
+                self._move(stem)
+            self._rewrite()
+
+    def release(self, mark: int):
+        """Forget about ``mark``, as the save it was obtained for failed"""
+        with self._lock:
+            self._marks.discard(mark)
+
+    def clear(self):
+        """Remove all records and the file"""
+        with self._lock:
+            self._records = []
+            self._rewrite()
+
+    def close(self):
+        """Close the journal, leaving its records for recovery"""
+        with self._lock:
+            self._close()
+            if self._file_lock is not None:
+                self._file_lock.release()
+                self._file_lock = None
+
+    def _move(self, stem: str):
+        path, file_lock = _free_path(stem, self.path)
+        if file_lock is None:
+            return  # already there
+        self._close()
+        if exists(self.path):
+            remove(self.path)
+        self._file_lock.release()
+        self.path, self._file_lock = path, file_lock
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _compact(self):
+        # Records are not merged across marks of pending saves. Compacted
+        # records get the first sequence number of their segment, so they
+        # stay on the same side of each mark, also for later compactions.
+        marks = sorted(self._marks)
+        segments = defaultdict(list)
+        for seq, record in self._records:
+            segments[bisect_right(marks, seq)].append((seq, record))
+        self._records = []
+        for _, segment in sorted(segments.items()):
+            records = compact([r for _, r in segment])
+            self._records += [(segment[0][0], r) for r in records]
+        self._rewrite()
+        self._limit = max(self._threshold, 2 * len(self._records))
+
+    def _rewrite(self):
+        self._close()
+        if not self._records:
+            if exists(self.path):
+                remove(self.path)
+            self._append = False
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            for _, record in self._records:
+                file.write(dumps(record, ensure_ascii=False) + "\n")
+        replace(tmp, self.path)
+        self._append = True
+
+
+def _free_path(stem: str,
+               own: str = None) -> tuple[str, Optional[FileLock]]:
+    # the lock is None if the path is the one already held
+    k = 1
+    while True:
+        path = Journal.path_of(stem, k)
+        if path == own:
+            return path, None
+        file_lock = FileLock(f"{path}{LOCK_SUFFIX}")
+        if file_lock.acquire():
+            return path, file_lock
+        k += 1
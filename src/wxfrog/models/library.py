@@ -0,0 +1,196 @@
+from collections.abc import Mapping, Sequence
+from datetime import datetime, UTC
+from json import dumps, loads
+from sqlite3 import connect
+from threading import Lock
+from typing import Optional
+
+from pint import DimensionalityError
+from pint.registry import Quantity
+
+from ..utils import DataStructure, Path
+from .scenarios import Scenario
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    modified REAL NOT NULL,
+    has_results INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_modified ON scenarios (modified);
+CREATE TABLE IF NOT EXISTS param_values (
+    param TEXT NOT NULL,
+    value REAL NOT NULL,
+    scenario INTEGER NOT NULL REFERENCES scenarios (id) ON DELETE CASCADE,
+    PRIMARY KEY (param, value, scenario)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS param_values_scenario ON param_values (scenario);
+CREATE TABLE IF NOT EXISTS indexed (
+    param TEXT PRIMARY KEY,
+    unit TEXT NOT NULL
+);
+"""
+
+Bounds = tuple[Optional[Quantity], Optional[Quantity]]
+
+
+class LibraryEntry:
+    """Summary of a scenario in the library, available without reading the
+    scenario itself"""
+    def __init__(self, name: str, modified: datetime, has_results: bool):
+        self.name = name
+        self.modified = modified
+        self.has_results = has_results
+
+    def mod_local_time(self):
+        return self.modified.astimezone()
+
+
+class ScenarioLibrary:
+    """A store of scenarios in a local SQLite database, meant to hold many
+    more scenarios than are reasonable to keep in a project file.
+
+    The values of the ``indexed`` parameters, given as mappings with ``path``
+    and ``uom`` entries like in the configuration, are stored in an indexed
+    table, such that scenarios can be found by parameter ranges without
+    reading the scenarios. Changing the indexed parameters triggers a
+    re-indexing of all scenarios when the library is opened.
+
+    The library is typically opened in another thread than the one using it,
+    hence the connection is shared between threads, guarded by a lock.
+    """
+    def __init__(self, path: str, indexed: Sequence[Mapping]):
+        self.path = path
+        self._indexed = {self._key(p["path"]): (tuple(p["path"]), p["uom"])
+                         for p in indexed}
+        self._lock = Lock()
+        self._con = connect(path, check_same_thread=False)
+        self._con.execute("PRAGMA foreign_keys = ON")
+        with self._con:
+            self._con.executescript(_SCHEMA)
+        self._check_index()
+
+    def __len__(self):
+        query = "SELECT COUNT(*) FROM scenarios"
+        with self._lock:
+            return self._con.execute(query).fetchone()[0]
+
+    def __contains__(self, name: str):
+        query = "SELECT 1 FROM scenarios WHERE name = ?"
+        with self._lock:
+            return self._con.execute(query, (name,)).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            self._con.close()
+
+    def entries(self) -> list[LibraryEntry]:
+        """Return the summary of all scenarios, ordered by name"""
+        query = "SELECT name, modified, has_results FROM scenarios " \
+                "ORDER BY name"
+        with self._lock:
+            rows = self._con.execute(query).fetchall()
+        return [LibraryEntry(n, datetime.fromtimestamp(m, UTC), bool(r))
+                for n, m, r in rows]
+
+    def store(self, name: str, scenario: Scenario):
+        """Store the scenario, replacing any existing one of same name"""
+        data = dumps(scenario.serialize(), ensure_ascii=False)
+        modified = scenario.modified.timestamp()
+        values = self._param_values(scenario.parameters)
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM scenarios WHERE name = ?", (name,))
+            cursor = self._con.execute(
+                "INSERT INTO scenarios (name, modified, has_results, data) "
+                "VALUES (?, ?, ?, ?)",
+                (name, modified, scenario.has_results(), data))
+            scenario_id = cursor.lastrowid
+            self._con.executemany(
+                "INSERT INTO param_values (param, value, scenario) "
+                "VALUES (?, ?, ?)",
+                [(k, v, scenario_id) for k, v in values.items()])
+
+    def load(self, name: str) -> Scenario:
+        query = "SELECT data FROM scenarios WHERE name = ?"
+        with self._lock:
+            row = self._con.execute(query, (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return Scenario.deserialize(loads(row[0]))
+
+    def rename(self, source: str, target: str):
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM scenarios WHERE name = ?",
+                              (target,))
+            self._con.execute("UPDATE scenarios SET name = ? WHERE name = ?",
+                              (target, source))
+
+    def delete(self, name: str):
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM scenarios WHERE name = ?", (name,))
+
+    def find(self, ranges: Mapping[Path, Bounds] = None,
+             modified_after: datetime = None,
+             modified_before: datetime = None) -> list[str]:
+        """Return the names of all scenarios of which the parameters are
+        within given ranges and that are modified within given times. Bounds
+        given as ``None`` are open. Only indexed parameters can be queried.
+        """
+        conditions, args = [], []
+        for path, bounds in ({} if ranges is None else ranges).items():
+            key = self._key(path)
+            if key not in self._indexed:
+                raise KeyError(f"Parameter {key} is not indexed")
+            unit = self._indexed[key][1]
+            sub = ["param = ?"]
+            args.append(key)
+            for bound, op in zip(bounds, (">=", "<=")):
+                if bound is not None:
+                    sub.append(f"value {op} ?")
+                    args.append(bound.m_as(unit))
+            conditions.append("id IN (SELECT scenario FROM param_values "
+                              f"WHERE {' AND '.join(sub)})")
+        for bound, op in ((modified_after, ">="), (modified_before, "<=")):
+            if bound is not None:
+                conditions.append(f"modified {op} ?")
+                args.append(bound.timestamp())
+        query = "SELECT name FROM scenarios"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        query += " ORDER BY name"
+        with self._lock:
+            return [n for n, in self._con.execute(query, args)]
+
+    @staticmethod
+    def _key(path: Sequence[str]) -> str:
+        return ".".join(path)
+
+    def _param_values(self, params: DataStructure) -> dict[str, float]:
+        result = {}
+        for key, (path, unit) in self._indexed.items():
+            try:
+                result[key] = params.get(path).m_as(unit)
+            except (KeyError, DimensionalityError):
+                continue  # not found in this scenario
+        return result
+
+    def _check_index(self):
+        indexed = {k: u for k, (_, u) in self._indexed.items()}
+        stored = dict(self._con.execute("SELECT param, unit FROM indexed"))
+        if stored == indexed:
+            return
+        # deserializes the parameters of all scenarios, but only once
+        with self._con:
+            self._con.execute("DELETE FROM param_values")
+            self._con.execute("DELETE FROM indexed")
+            self._con.executemany("INSERT INTO indexed VALUES (?, ?)",
+                                  indexed.items())
+            query = "SELECT id, data FROM scenarios"
+            for scenario_id, data in self._con.execute(query).fetchall():
+                params = DataStructure.from_jsonable(loads(data)["parameters"])
+                self._con.executemany(
+                    "INSERT INTO param_values VALUES (?, ?, ?)",
+                    [(k, v, scenario_id)
+                     for k, v in self._param_values(params).items()])
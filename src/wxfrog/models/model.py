@@ -1,24 +1,58 @@
-from collections.abc import Set, Collection, MutableMapping
+from collections import deque
+from collections.abc import (
+    Set, Collection, MutableMapping, Sequence, Iterator)
+from dataclasses import dataclass
 from threading import Thread
 from copy import deepcopy
 from math import nan
+from os import name as os_name
+from os.path import exists, join, expanduser
+from datetime import datetime
+from tempfile import gettempdir
+from typing import Optional
+from uuid import uuid4
+from functools import partial
 
 from pint import DimensionalityError, DefinitionSyntaxError, UndefinedUnitError
 from pint.registry import Quantity
 from pubsub import pub
 
 from wxfrog.utils import (
-    fmt_unit, ThreadedStringIO, get_unit_registry, DataStructure, Path)
+    fmt_unit, format_unit, ThreadedStringIO, get_unit_registry, DataStructure,
+    Path)
 from wxfrog.config import (
     Configuration, ConfigurationError, ParameterNotFound, UnitSyntaxError,
     UndefinedUnit, UnitConversionError, OutOfBounds)
 from wxfrog.events import (
-    INITIALIZATION_DONE, CALCULATION_DONE, CALCULATION_FAILED)
+    INITIALIZATION_DONE, CALCULATION_DONE, CALCULATION_FAILED, SAVE_FILE_DONE,
+    SAVE_FILE_FAILED)
 from .engine import CalculationEngine, CalculationFailed
-from .casestudy import CaseStudy, ParameterSpec
+from .casestudy import CaseStudy, CaseStudyResults, ParameterSpec
 from .scenarios import (Scenario, SCENARIO_DEFAULT, SCENARIO_CURRENT,
                         SCENARIO_CONVERGED)
 from .html import HtmlTable
+from .project import (
+    ProjectFile, ProjectSaver, write_project, encode, encoded, INDEX_MEMBER,
+    LEGACY_MEMBER,
+    UNITS_MEMBER, CASE_STUDY_MEMBER, RESULTS_SCHEMA_MEMBER,
+    RESULTS_DATA_MEMBER, FORMAT_VERSION)
+from .journal import (
+    Journal, read_journal, diff, patch, fmt_value,
+    OP_SET_PARAM, OP_COPY, OP_RENAME, OP_DELETE, OP_CONVERGED, OP_LIBRARY)
+from .library import ScenarioLibrary
+from .export import TableExport
+
+
+@dataclass
+class _PendingSave:
+    """State of the model when a save was queued, taken over as saved state
+    once the saving thread reports success"""
+    path: str
+    written: list[tuple[Scenario, str, int]]  # scenario, member, revision
+    units: list[str]
+    case_study: Optional[str]
+    results: Optional[tuple[CaseStudyResults, int]]
+    succeeded: Optional[bool] = None  # set by the saving thread
 
 
 class Model:
@@ -30,6 +64,17 @@ class Model:
         self._scenarios : MutableMapping[str, Scenario] = {}
         self._case_study = None
         self.file_path = None
+        # state of last saved or loaded project file, to detect changes
+        self._saved_units = None
+        self._saved_case_study = None
+        self._saved_results = None
+        self._project: Optional[ProjectFile] = None
+        self._source_path: Optional[str] = None
+        self._saver = ProjectSaver()
+        self._pending_saves: deque[_PendingSave] = deque()
+        # unsaved changes, to recover from a crash
+        self._journal: Optional[Journal] = None
+        self.library: Optional[ScenarioLibrary] = None
 
     def initialise_engine(self):
         def f():
@@ -43,12 +88,15 @@ class Model:
         snc = self._scenarios
         snc[SCENARIO_DEFAULT] = Scenario(default_params)
         snc[SCENARIO_CURRENT] = deepcopy(snc[SCENARIO_DEFAULT])
-        u_cls = get_unit_registry().Unit
-        self._all_units = {fmt_unit(u_cls(u))
+        self._open_journal(None)
+        self._all_units = {fmt_unit(u)
                            for u in self._configuration.get("units", [])}
         errors = self._initialize_parameters(default_params)
         for r in self._configuration["results"]:
-            self._all_units.add(fmt_unit(u_cls(r["uom"])))
+            self._all_units.add(fmt_unit(r["uom"]))
+        if (spec := self._configuration.get("scenario_library")) is not None:
+            self.library = ScenarioLibrary(expanduser(spec["file"]),
+                                           spec.get("parameters", []))
         return errors
 
     @property
@@ -69,19 +117,75 @@ class Model:
                 pub.sendMessage(CALCULATION_FAILED, message=str(error))
             else:
                 scn.results = results
+                previous = self._scenarios.get(SCENARIO_CONVERGED)
                 self._scenarios[SCENARIO_CONVERGED] = scn
+                self._record_converged(scn, previous)
                 pub.sendMessage(CALCULATION_DONE)
 
         scn = deepcopy(self._scenarios[SCENARIO_CURRENT])
         Thread(target=f, daemon=True).start()
 
+    def set_param(self, name: str, path: Path, value: Quantity):
+        scenario = self._scenarios[name]
+        scenario.set_param(path, value)
+        self._record({"op": OP_SET_PARAM, "scenario": name, "path": path,
+                      "value": fmt_value(value),
+                      "modified": scenario.modified.isoformat()})
+
+    def copy_scenario(self, source: str, target: str):
+        self._scenarios[target] = deepcopy(self._scenarios[source])
+        self._record({"op": OP_COPY, "source": source, "target": target})
+
+    def rename_scenario(self, source: str, target: str):
+        self._scenarios[target] = self._scenarios.pop(source)
+        self._record({"op": OP_RENAME, "source": source, "target": target})
+
+    def delete_scenario(self, name: str):
+        del self._scenarios[name]
+        self._record({"op": OP_DELETE, "name": name})
+
+    def store_in_library(self, name: str, target: str):
+        """Store the scenario ``name`` as ``target`` in the library"""
+        self.library.store(target, self._scenarios[name])
+
+    def fetch_from_library(self, source: str, target: str):
+        """Load the scenario ``source`` from the library as ``target``"""
+        scenario = self._scenarios[target] = self.library.load(source)
+        # the library might change until recovery, so the data is kept
+        self._record({"op": OP_LIBRARY, "source": source, "target": target,
+                      "scenario": scenario.serialize()})
+
+    def recoverable_changes(self) -> int:
+        """Return the number of changes left in the journal by a previous
+        session that did not end properly"""
+        if self._journal is None or len(self._journal):
+            return 0
+        return len(read_journal(self._journal.path))
+
+    def recover(self):
+        """Apply the changes left in the journal by a previous session"""
+        for record in self._journal.load():
+            self._replay(record)
+
+    def discard_recovery(self):
+        self._journal.clear()
+
+    def close(self):
+        """Wait for pending saves and remove the journal, as the application
+        is closed properly"""
+        self.wait_for_save()
+        if self._journal is not None:
+            self._journal.clear()
+            self._journal.close()
+        if self.library is not None:
+            self.library.close()
+
     def compatible_units(self, value: Quantity) -> Set[str]:
         result = {u for u in self._all_units if value.is_compatible_with(u)}
         return result | {fmt_unit(value.u)}
 
     def register_unit(self, unit):
-        unit_cls = get_unit_registry().Unit
-        self._all_units.add(fmt_unit(unit_cls(unit)))
+        self._all_units.add(fmt_unit(unit))
 
     def get_param_info(self, path):
         qty_cls = get_unit_registry().Quantity
@@ -106,7 +210,32 @@ class Model:
         units = self.compatible_units(value)
         return { "spec": spec, "min": min_, "max": max_, "units": units}
 
-    def collect_stream_table(self, name: str) -> str:
+    def collect_stream_table(self, name: str) -> HtmlTable:
+        streams, props, table_data = self._stream_table(name)
+        table = HtmlTable(streams["label"], props["label"])
+        table.label = name
+        table.title = "Unnamed" if self.file_path is None else self.file_path
+        table.add_row_unit_column(props["uom"])
+        table.add_column_header_row([""] * len(streams["label"]))
+        table.set_top_rect_headers([["Stream", ""], ["Property", "Unit"]])
+        for k, (t, f) in enumerate(zip(props["tolerance"], props["fmt"])):
+            table.set_threshold(k, t)
+            table.set_nan(k, "")
+            table.set_row_format(k, f)
+        table.set_data(table_data)
+        return table
+
+    def export_stream_table(self, path: str, name: str) -> TableExport:
+        """Return an export of the stream table into a csv or tsv file"""
+        streams, props, table_data = self._stream_table(name)
+        headers = [["Property", "Unit"] + streams["label"]]
+        row_headers = [[label, format_unit(u, "~")]
+                       for label, u in zip(props["label"], props["uom"])]
+        return TableExport(path, headers, table_data, len(table_data),
+                           row_headers)
+
+    def _stream_table(self, name: str):
+        # return stream and property definitions, and the data
         def get(d: DataStructure, p: Path, unit) -> float:
             try:
                 return d.get(p).to(unit).m
@@ -123,21 +252,9 @@ class Model:
         props = {k: [p[k] for p in props_raw]
                  for k in ["label", "uom", "path", "fmt"]}
         props["tolerance"] = [float(p.get("tolerance", 0)) for p in props_raw]
-        table = HtmlTable(streams["label"], props["label"])
-        table.label = name
-        table.title = "Unnamed" if self.file_path is None else self.file_path
-        table.add_row_unit_column(props["uom"])
-        table.add_column_header_row([""] * len(streams["label"]))
-        table.set_top_rect_headers([["Stream", ""], ["Property", "Unit"]])
-        for k, (t, f) in enumerate(zip(props["tolerance"], props["fmt"])):
-            table.set_threshold(k, t)
-            table.set_nan(k, "")
-            table.set_row_format(k, f)
-        # set data
         table_data = [[get(data, s + p, u) for s in streams["path"]]
                       for p, u in zip(props["path"], props["uom"])]
-        table.set_data(table_data)
-        return table.render()
+        return streams, props, table_data
 
     def _initialize_parameters(
             self, param: DataStructure) -> Collection[ConfigurationError]:
@@ -182,21 +299,265 @@ class Model:
     def collect_case_study_results(self, paths):
         return self._case_study.collect(self.file_path, paths)
 
-    def serialize(self, case_study_param):
+    def export_case_study(self, path: str,
+                          paths: Sequence[Path]) -> TableExport:
+        return self._case_study.export(path, paths)
+
+    def case_study_cases(self) -> tuple[int, Iterator[tuple[DataStructure,
+                                                               DataStructure]]]:
+        """Return the number of cases calculated so far, and an iterator over
+        their parameters and results, see
+        :meth:`~wxfrog.models.casestudy.CaseStudyResults.cases`"""
         case_study = self._case_study
+        num_rows = case_study.results.num_rows
+        params = case_study.scenario.parameters
+        return num_rows, case_study.results.cases(params, num_rows)
+
+    def save(self, path: str, case_study_param):
+        """Save the model as project file into ``path``.
+
+        A snapshot of the model is taken right away, while encoding and
+        writing happens in a background thread. Subsequent saves are queued.
+        Only members that changed since the last save are encoded, while
+        unchanged ones are copied over from the previous project file.
+        Completion is reported via ``SAVE_FILE_DONE`` or ``SAVE_FILE_FAILED``,
+        upon which :meth:`finish_saves` shall be called in the calling thread.
+        """
+        def add_scenario(scn: Scenario) -> str:
+            if id(scn) in written:
+                return written[id(scn)][1]
+            if incremental and not scn.dirty:
+                member = scn.member
+                members[member] = None
+            else:
+                member = f"scenarios/{uuid4().hex}.json"
+                members[member] = encoded(scn.snapshot().serialize)
+            written[id(scn)] = scn, member, scn.revision
+            return member
+
+        def job():
+            try:
+                write_project(path, members, source,
+                              stored=[RESULTS_DATA_MEMBER])
+            except Exception as error:  # report any failure back to the user
+                if journal is not None:
+                    journal.release(mark)
+                pending.succeeded = False
+                pub.sendMessage(SAVE_FILE_FAILED, path=path, message=str(error))
+                return
+            if journal is not None:
+                # changes made since the save was requested stay in journal
+                journal.truncate(mark, path)
+            pending.succeeded = True
+            pub.sendMessage(SAVE_FILE_DONE, path=path)
+
+        # The saved state is only changed by finish_saves in this thread, so
+        # it is consistent here. The previous file only contains the members
+        # of scenarios that were clean then, even if further saves are queued.
+        self.finish_saves()
+        source = self._source_path
+        incremental = source is not None and exists(source)
+        members, written = {}, {}
+        scenarios = {
+            name: {"member": add_scenario(scn),
+                   "modified": scn.modified.isoformat(),
+                   "results": scn.has_results()}
+            for name, scn in self._scenarios.items()}
+
+        units = sorted(self._all_units)
+        unchanged = incremental and units == self._saved_units
+        members[UNITS_MEMBER] = None if unchanged else encode(units)
+
+        case_study, case_study_scenario = self._case_study, None
         if case_study is not None:
-            case_study = case_study.serialize(case_study_param)
-        return {
-            "units": list(self._all_units),
-            "scenarios": {n: s.serialize() for n, s in self._scenarios.items()},
-            "case_study": case_study
-        }
-
-    def deserialize(self, data):
+            scn = case_study.scenario
+            case_study = encode({
+                "scenario": add_scenario(scn),
+                "parameters": CaseStudy.serialize_parameters(case_study_param)
+            })
+            case_study_scenario = {"modified": scn.modified.isoformat(),
+                                   "results": scn.has_results()}
+            unchanged = incremental and case_study == self._saved_case_study
+            members[CASE_STUDY_MEMBER] = None if unchanged else case_study
+
+        results, saved_results = None, None
+        if self._case_study is not None:
+            results = self._case_study.results
+        if results is not None and not results.num_rows:
+            results = None  # nothing worth saving
+        if results is not None:
+            saved_results = results, results.num_rows
+            if incremental and saved_results == self._saved_results:
+                members[RESULTS_SCHEMA_MEMBER] = None
+                members[RESULTS_DATA_MEMBER] = None
+            else:
+                rows = results.num_rows
+                members[RESULTS_SCHEMA_MEMBER] = encode(results.schema(rows))
+                members[RESULTS_DATA_MEMBER] = partial(results.data, rows)
+            if os_name == "nt":
+                # Windows refuses to replace a file that is memory-mapped
+                results.detach()
+
+        members[INDEX_MEMBER] = encode({
+            "version": FORMAT_VERSION,
+            "units": UNITS_MEMBER,
+            "scenarios": scenarios,
+            "case_study": None if case_study is None else CASE_STUDY_MEMBER,
+            "case_study_scenario": case_study_scenario,
+            "case_study_results":
+                None if results is None else RESULTS_SCHEMA_MEMBER
+        })
+        pending = _PendingSave(path, list(written.values()), units,
+                               case_study, saved_results)
+        self._pending_saves.append(pending)
+        if (journal := self._journal) is not None:
+            mark = journal.mark()
+        self._saver.submit(job)
+
+    def finish_saves(self):
+        """Take over the state of completed saves as saved state, in order.
+        Only the path of a successful save becomes the model's file path."""
+        pending = self._pending_saves
+        while pending and pending[0].succeeded is not None:
+            save = pending.popleft()
+            if not save.succeeded:
+                continue
+            for scn, member, revision in save.written:
+                scn.saved = member, revision
+            self._saved_units = save.units
+            self._saved_case_study = save.case_study
+            self._saved_results = save.results
+            self._source_path = self.file_path = save.path
+            if self._project is not None:
+                # members of scenarios not loaded yet are now found here
+                self._project.path = save.path
+
+    def wait_for_save(self):
+        """Block until all pending saves are written"""
+        self._saver.wait()
+        self.finish_saves()
+
+    def load(self, path: str):
+        """Load the model from the project file at ``path``, and return the
+        parameter information of the case study."""
+        def lazy_scenario(member, modified, has_results):
+            return Scenario.lazy(project.loader(member), member,
+                                 datetime.fromisoformat(modified), has_results)
+
+        project = ProjectFile(path)
+        self._open_journal(path)
+        if project.is_legacy():
+            param = self._deserialize_legacy(project.read_json(LEGACY_MEMBER))
+            self.file_path, self._project = path, None
+            self._source_path = path
+            return param
+
+        # scenarios are only read from file once they are accessed
+        index = project.read_json(INDEX_MEMBER)
+        self._saved_units = sorted(project.read_json(index["units"]))
+        self._all_units = set(self._saved_units)
+        self._scenarios = {
+            name: lazy_scenario(e["member"], e["modified"], e["results"])
+            for name, e in index["scenarios"].items()}
+        self._case_study, param, self._saved_case_study = None, [], None
+        self._saved_results = None
+        if (member := index["case_study"]) is not None:
+            data = project.read_json(member)
+            entry = index["case_study_scenario"]
+            scenario = lazy_scenario(
+                data["scenario"], entry["modified"], entry["results"])
+            self._case_study, param = CaseStudy.deserialize(
+                self._engine, self._out_stream, scenario, data["parameters"])
+            self._saved_case_study = encode(data)
+            if (member := index.get("case_study_results")) is not None:
+                self._case_study.results = CaseStudyResults.from_buffer(
+                    project.read_json(member), project.map(RESULTS_DATA_MEMBER))
+                results = self._case_study.results
+                self._saved_results = results, results.num_rows
+        self.file_path, self._project = path, project
+        self._source_path = path
+        return param
+
+    def _open_journal(self, path: Optional[str]):
+        # Changes of untitled projects are journaled in the temp directory.
+        # Unsaved changes of the previous project are discarded on purpose.
+        # Journals of other running instances are locked, so never touched.
+        if self._journal is not None:
+            self._journal.clear()
+            self._journal.close()
+        if path is None:
+            path = join(gettempdir(), self._configuration["app_name"])
+        self._journal = Journal.open_free(path)
+
+    def _record(self, record):
+        if self._journal is not None:
+            self._journal.append(record)
+
+    def _record_converged(self, scenario: Scenario,
+                          previous: Optional[Scenario]):
+        # parameters are stored relative to the current scenario, which is
+        # usually unchanged, and results relative to the previous ones.
+        current = self._scenarios[SCENARIO_CURRENT].parameters
+        results = None if previous is None else previous.results
+        self._record({
+            "op": OP_CONVERGED,
+            "modified": scenario.modified.isoformat(),
+            "parameters": diff(current, scenario.parameters),
+            "results": diff(results, scenario.results)
+        })
+
+    def _replay(self, record):
+        op = record["op"]
+        if op == OP_SET_PARAM:
+            scenario = self._scenarios[record["scenario"]]
+            qty_cls = get_unit_registry().Quantity
+            scenario.set_param(tuple(record["path"]), qty_cls(record["value"]))
+            scenario.modified = datetime.fromisoformat(record["modified"])
+        elif op == OP_COPY:
+            source, target = record["source"], record["target"]
+            self._scenarios[target] = deepcopy(self._scenarios[source])
+        elif op == OP_RENAME:
+            source, target = record["source"], record["target"]
+            self._scenarios[target] = self._scenarios.pop(source)
+        elif op == OP_DELETE:
+            del self._scenarios[record["name"]]
+        elif op == OP_LIBRARY:
+            source = record["source"]
+            if (data := record.get("scenario")) is not None:
+                scenario = Scenario.deserialize(data)
+            elif self.library is not None and source in self.library:
+                scenario = self.library.load(source)  # older journals
+            else:
+                print(f"Scenario {source} is not in the library anymore "
+                      "and can't be recovered", file=self._out_stream)
+                return
+            self._scenarios[record["target"]] = scenario
+        elif op == OP_CONVERGED:
+            current = self._scenarios[SCENARIO_CURRENT]
+            previous = self._scenarios.get(SCENARIO_CONVERGED)
+            scenario = deepcopy(current)
+            patch(scenario.parameters, record["parameters"])
+            scenario.modified = datetime.fromisoformat(record["modified"])
+            results = DataStructure() if previous is None else \
+                previous.results.copy_tree()
+            patch(results, record["results"])
+            scenario.results = results
+            self._scenarios[SCENARIO_CONVERGED] = scenario
+            # as done by the controller when the calculation is done
+            if current.modified == scenario.modified:
+                current.results = results
+
+    def _deserialize_legacy(self, data):
         self._all_units = set(data["units"])
+        self._saved_units = self._saved_case_study = None
+        self._saved_results = None
         self._scenarios = {n: Scenario.deserialize(d)
                            for n, d in data["scenarios"].items()}
+        if (case_study := data["case_study"]) is None:
+            self._case_study = None
+            return []
+        scenario = Scenario.deserialize(case_study["scenario"])
         self._case_study, param = CaseStudy.deserialize(
-            self._engine, self._out_stream, data["case_study"])
+            self._engine, self._out_stream, scenario, case_study["parameters"])
         return param
 
@@ -0,0 +1,208 @@
+from collections.abc import Mapping, Callable, Collection
+from functools import partial
+from json import dumps, load
+from mmap import mmap, ACCESS_READ
+from os import replace, unlink, chmod, stat, umask
+from os.path import dirname, abspath
+from queue import Queue
+from struct import pack, unpack
+from tempfile import NamedTemporaryFile
+from threading import Thread
+from time import localtime
+from typing import Optional
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+
+from ..utils import JSONType
+
+INDEX_MEMBER = "index.json"
+LEGACY_MEMBER = "data.json"  # single member of project files up to V1.0b2
+UNITS_MEMBER = "units.json"
+CASE_STUDY_MEMBER = "case_study.json"
+RESULTS_SCHEMA_MEMBER = "case_study_results.json"
+RESULTS_DATA_MEMBER = "case_study_results.bin"
+FORMAT_VERSION = 2
+
+_LOCAL_HEADER_SIZE = 30
+_ALIGNMENT = 8  # data of stored members start at multiples of this offset
+_ALIGNMENT_EXTRA_ID = 0xD935  # extra field id as used by Android's zipalign
+
+
+MemberContent = str | bytes | Callable[[], str | bytes] | None
+
+
+def encode(data: JSONType) -> str:
+    return dumps(data, indent=2, ensure_ascii=False)
+
+
+def encoded(func: Callable[[], JSONType]) -> Callable[[], str]:
+    """Defer the creation and encoding of a json member to the time it is
+    written"""
+    return lambda: encode(func())
+
+
+class ProjectFile:
+    """Access to the members of a project file on disk. The file is only
+    opened for the duration of each read, so that it can be replaced by a
+    later save."""
+    def __init__(self, path: str):
+        self.path = path
+
+    def __deepcopy__(self, memo):
+        # copied lazy scenarios must keep following the same file
+        return self
+
+    def loader(self, member: str) -> Callable[[], JSONType]:
+        """Return a callable that reads the given member on demand"""
+        return partial(self.read_json, member)
+
+    def members(self) -> set[str]:
+        with ZipFile(self.path, "r") as zip_file:
+            return set(zip_file.namelist())
+
+    def is_legacy(self) -> bool:
+        return LEGACY_MEMBER in self.members()
+
+    def read_json(self, member: str) -> JSONType:
+        with ZipFile(self.path, "r") as zip_file:
+            with zip_file.open(member) as file:
+                return load(file)
+
+    def map(self, member: str) -> memoryview:
+        """Return a read-only view of the member's content. Uncompressed
+        members are memory-mapped, so only the parts actually used are read
+        from disk. Compressed members are read into memory."""
+        with ZipFile(self.path, "r") as zip_file:
+            info = zip_file.getinfo(member)
+            if info.compress_type != ZIP_STORED:
+                return memoryview(zip_file.read(member))
+            offset = _data_offset(zip_file, info)
+        with open(self.path, "rb") as file:
+            mapped = mmap(file.fileno(), 0, access=ACCESS_READ)
+        return memoryview(mapped)[offset:offset + info.file_size]
+
+
+def write_project(path: str, members: Mapping[str, MemberContent],
+                  source: str = None, stored: Collection[str] = ()):
+    """Write a project file with the given members.
+
+    A member with ``None`` content is copied from the ``source`` project file
+    as raw compressed bytes, i.e. without decompressing, decoding, encoding and
+    compressing it again. All other members are written, with callables being
+    called first to obtain the content, and ``str`` content being encoded as
+    utf-8. Members named in ``stored`` are written without
+    compression, and aligned to be memory-mapped (see :meth:`ProjectFile.map`).
+
+    The file is written to a temporary file in the target directory first,
+    which then replaces the target. This allows ``source`` and ``path`` to be
+    the same file, and never leaves a half-written project file behind.
+    """
+    tmp = NamedTemporaryFile(dir=dirname(abspath(path)), suffix=".tmp",
+                             delete=False)
+    try:
+        with tmp, ZipFile(tmp, "w", compression=ZIP_DEFLATED) as target:
+            copied = [m for m, content in members.items() if content is None]
+            if copied:
+                with ZipFile(source, "r") as src:
+                    for member in copied:
+                        _copy_raw(src, target, member)
+            for member, content in members.items():
+                if content is None:
+                    continue
+                if callable(content):
+                    content = content()
+                if member in stored:
+                    info = ZipInfo(member, localtime()[:6])
+                    info.compress_type = ZIP_STORED
+                    info.external_attr = 0o600 << 16
+                    info.extra = _alignment_extra(target, member)
+                    target.writestr(info, content)
+                else:
+                    target.writestr(member, content)
+        # temporary files are private, but the project shall not become so
+        chmod(tmp.name, _file_mode(path))
+        replace(tmp.name, path)
+    except BaseException:
+        unlink(tmp.name)
+        raise
+
+
+class ProjectSaver:
+    """Run save jobs in a background thread, strictly one after the other"""
+    def __init__(self):
+        self._queue: Queue[Callable[[], None]] = Queue()
+        self._thread: Optional[Thread] = None
+
+    def submit(self, job: Callable[[], None]):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put(job)
+
+    def wait(self):
+        """Block until all submitted jobs are done"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job()
+            finally:
+                self._queue.task_done()
+
+
+def _file_mode(path: str) -> int:
+    """Return the permissions of the file at ``path``, or those of a new
+    file if it doesn't exist"""
+    try:
+        return stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mask = umask(0)  # there is no way to only read it
+        umask(mask)
+        return 0o666 & ~mask
+
+
+def _data_offset(zip_file: ZipFile, info: ZipInfo) -> int:
+    """Return the file offset of the member's (compressed) data"""
+    fp = zip_file.fp
+    fp.seek(info.header_offset)
+    header = fp.read(_LOCAL_HEADER_SIZE)
+    name_len, extra_len = unpack("<HH", header[26:30])
+    return info.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len
+
+
+def _alignment_extra(target: ZipFile, member: str) -> bytes:
+    """Return an extra field for the local header of the next member to be
+    written, padding the header such that the data is aligned."""
+    offset = target.start_dir + _LOCAL_HEADER_SIZE + len(member.encode())
+    padding = -(offset + 4) % _ALIGNMENT
+    return pack("<HH", _ALIGNMENT_EXTRA_ID, padding) + bytes(padding)
+
+
+def _copy_raw(source: ZipFile, target: ZipFile, member: str):
+    # The zipfile module has no public API for this, so the local header is
+    # written here, and the target's bookkeeping updated as its own writer
+    # does.
+    info = source.getinfo(member)
+    source.fp.seek(_data_offset(source, info))
+    raw = source.fp.read(info.compress_size)
+
+    new = ZipInfo(info.filename, info.date_time)
+    new.compress_type = info.compress_type
+    new.external_attr = info.external_attr
+    new.CRC = info.CRC
+    new.compress_size = info.compress_size
+    new.file_size = info.file_size
+    new.flag_bits = info.flag_bits & ~0x08  # sizes are known, no descriptor
+    if new.compress_type == ZIP_STORED:
+        new.extra = _alignment_extra(target, new.filename)
+
+    fp = target.fp
+    fp.seek(target.start_dir)
+    new.header_offset = fp.tell()
+    fp.write(new.FileHeader())
+    fp.write(raw)
+    target.start_dir = fp.tell()
+    target.filelist.append(new)
+    target.NameToInfo[new.filename] = new
+    target._didModify = True
@@ -0,0 +1,131 @@
+from collections.abc import Mapping, Iterator
+from typing import Optional
+
+from pint.registry import Quantity
+
+from ..utils import Path, DataStructure, get_path_table
+
+
+class ResultNode:
+    """Node of a :class:`ResultTree`. Containers have a list of ``children``
+    in the order of the data, while leaves have ``children`` set to ``None``
+    and carry a ``value``. The ``id`` is the one of the path."""
+    __slots__ = ("id", "path", "parent", "children", "value", "__weakref__")
+
+    def __init__(self, id_: Optional[int], path: Path,
+                 parent: Optional["ResultNode"]):
+        self.id = id_
+        self.path = path
+        self.parent = parent
+        self.children: Optional[list["ResultNode"]] = []
+        self.value: Optional[Quantity] = None
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.children is None
+
+    @property
+    def name(self) -> str:
+        return self.path[-1]
+
+
+class ResultTree:
+    """Tree of result nodes to back the result view.
+
+    Nodes are kept by path id as long as their path is part of the data,
+    such that the same path is represented by the same node object, also
+    after the tree is updated with new data. A view can therefore use the
+    node identity as stable item id, and only needs to refresh the leaves
+    reported as changed by :meth:`update`. Nodes of paths that disappear
+    are dropped, so the tree never holds more than the current data.
+    """
+    def __init__(self):
+        self.root = ResultNode(None, (), None)
+        self._nodes: dict[int, ResultNode] = {}
+
+    def __len__(self):
+        """Return the number of nodes, not counting the root"""
+        return len(self._nodes)
+
+    def update(self, data: Mapping) -> Optional[list[ResultNode]]:
+        """Make the tree represent ``data``. Return the leaves of which the
+        value has changed, or ``None`` if the structure of the tree has
+        changed, such that views need to be rebuilt entirely."""
+        table = get_path_table()
+        changed = []
+        structure_changed = False
+
+        def dive(node: ResultNode, struct: Mapping):
+            nonlocal structure_changed
+            children = node.children
+            if children is None or len(children) != len(struct) or any(
+                    c.name != k for c, k in zip(children, struct)):
+                structure_changed = True
+                children = node.children = [
+                    self._node(table.id_of(node.path + (k, )), node)
+                    for k in struct]
+            for child, value in zip(children, struct.values()):
+                if isinstance(value, Mapping):
+                    if child.children is None:
+                        structure_changed = True
+                        child.children, child.value = [], None
+                    dive(child, value)
+                else:
+                    if child.children is not None:
+                        structure_changed = True
+                        child.children = None
+                    if not _same(child.value, value):
+                        child.value = value
+                        changed.append(child)
+
+        dive(self.root, data)
+        if not structure_changed:
+            return changed
+        self._prune()
+        return None
+
+    def refresh(self, data: DataStructure) -> list[ResultNode]:
+        """Take over the values of all leaves from ``data``, which must
+        contain all paths of the tree. Return the leaves that changed."""
+        changed = []
+        for node in self.leaves():
+            if not _same(node.value, value := data.get(node.path)):
+                node.value = value
+                changed.append(node)
+        return changed
+
+    def leaves(self) -> Iterator[ResultNode]:
+        """Iterate through all leaves in depth-first order"""
+        stack = [iter(self.root.children)]
+        while stack:
+            for node in stack[-1]:
+                if node.children is None:
+                    yield node
+                else:
+                    stack.append(iter(node.children))
+                    break
+            else:
+                stack.pop()
+
+    def _prune(self):
+        # forget the nodes that are no longer part of the tree
+        nodes, stack = {}, [self.root]
+        while stack:
+            for child in stack.pop().children:
+                nodes[child.id] = child
+                if child.children is not None:
+                    stack.append(child)
+        self._nodes = nodes
+
+    def _node(self, id_: int, parent: ResultNode) -> ResultNode:
+        try:
+            return self._nodes[id_]
+        except KeyError:
+            node = ResultNode(id_, get_path_table().path_of(id_), parent)
+            self._nodes[id_] = node
+            return node
+
+
+def _same(old: Optional[Quantity], new: Quantity) -> bool:
+    return old is new or (old is not None and
+                          old.m == new.m and old.u == new.u)
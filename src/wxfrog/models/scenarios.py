@@ -1,6 +1,7 @@
 from datetime import UTC, datetime
-from collections.abc import Sequence
-from typing import Self
+from collections.abc import Sequence, Callable
+from typing import Self, Optional
+from copy import deepcopy
 from pint.registry import Quantity
 
 from ..utils import DataStructure, JSONType
@@ -13,10 +14,91 @@ SCENARIO_CONVERGED = "* Converged"
 
 class Scenario:
     def __init__(self, parameters: DataStructure, modified: datetime = None):
-        self.parameters: DataStructure = parameters
-        self.results: DataStructure = DataStructure()
-        self.internal_state : JSONType = None
+        self._parameters: DataStructure = parameters
+        self._results: DataStructure = DataStructure()
+        self._internal_state : JSONType = None
         self.modified = datetime.now(UTC) if modified is None else modified
+        # Every change increments the revision. The saved attribute holds
+        # the name of the project file member and the revision written there.
+        # It is replaced as a whole, as saving happens in another thread.
+        self.revision = 0
+        self.saved: Optional[tuple[str, int]] = None
+        # for scenarios not yet read from project file
+        self._loader: Optional[Callable[[], JSONType]] = None
+        self._has_results = False
+
+    @classmethod
+    def lazy(cls, loader: Callable[[], JSONType], member: str,
+             modified: datetime, has_results: bool) -> Self:
+        """Create a scenario of which parameters, results and internal state
+        are only obtained from ``loader`` on first access."""
+        result = cls(DataStructure(), modified)
+        result._loader = loader
+        result._has_results = has_results
+        result.saved = member, result.revision
+        return result
+
+    def _load(self):
+        data = self._loader()
+        self._loader = None
+        self._parameters = DataStructure.from_jsonable(data["parameters"])
+        self._results = DataStructure.from_jsonable(data["results"])
+        self._internal_state = data["state"]
+
+    @property
+    def parameters(self) -> DataStructure:
+        if self._loader is not None:
+            self._load()
+        return self._parameters
+
+    @property
+    def results(self) -> DataStructure:
+        if self._loader is not None:
+            self._load()
+        return self._results
+
+    @results.setter
+    def results(self, results: DataStructure):
+        if self._loader is not None:
+            self._load()
+        self._results = results
+        self.touch()
+
+    @property
+    def internal_state(self) -> JSONType:
+        if self._loader is not None:
+            self._load()
+        return self._internal_state
+
+    @internal_state.setter
+    def internal_state(self, state: JSONType):
+        if self._loader is not None:
+            self._load()
+        self._internal_state = state
+        self.touch()
+
+    @property
+    def member(self) -> Optional[str]:
+        return None if self.saved is None else self.saved[0]
+
+    @property
+    def dirty(self) -> bool:
+        return self.saved is None or self.saved[1] != self.revision
+
+    def touch(self):
+        """Mark the scenario as changed, e.g. after modifying the parameter
+        or result structures in place"""
+        self.revision += 1
+
+    def snapshot(self) -> Self:
+        """Return a copy that can be serialized in another thread while this
+        scenario is modified. The nested structures are copied, while the
+        quantities themselves are shared, as they are never changed in
+        place."""
+        result = Scenario(self.parameters.copy_tree(), self.modified)
+        result._results = self.results.copy_tree()
+        result._internal_state = deepcopy(self.internal_state)
+        return result
 
     def set_param(self, path: Sequence[str], value: Quantity):
         self.parameters.set(path, value)
@@ -27,7 +109,9 @@ class Scenario:
         return self.modified.astimezone()
 
     def has_results(self) -> bool:
-        return len(self.results) > 0
+        if self._loader is not None:
+            return self._has_results
+        return len(self._results) > 0
 
     def serialize(self) -> JSONType:
         return {
@@ -38,9 +122,11 @@ class Scenario:
         }
 
     @classmethod
-    def deserialize(cls, data: JSONType) -> Self:
+    def deserialize(cls, data: JSONType, member: str = None) -> Self:
         result = cls(DataStructure.from_jsonable(data["parameters"]),
                      datetime.fromisoformat(data["modified"]))
         result.internal_state = data["state"]
         result.results = DataStructure.from_jsonable(data["results"])
+        if member is not None:
+            result.saved = member, result.revision
         return result
@@ -0,0 +1,81 @@
+from collections.abc import Iterable
+from math import floor, ceil
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+Rect = tuple[float, float, float, float]  # x, y, width, height
+
+CELL_SIZE = 64
+
+
+class GridIndex(Generic[T]):
+    """Spatial index of items with rectangular bounds, for instance labels
+    on the canvas with their hitboxes.
+
+    The plane is divided into square cells, and each item is registered in
+    all cells its rectangle overlaps. A point lookup thereby only checks the
+    few items of one cell. Items are kept in insertion order, and
+    :meth:`at` returns the first inserted item that contains the point.
+    Like for ``wx.Rect``, the right and bottom edges are exclusive.
+    """
+    def __init__(self, items: Iterable[tuple[Rect, T]] = (),
+                 cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], list[tuple[Rect, int, T]]] = {}
+        self._count = 0
+        self.build(items)
+
+    def __len__(self):
+        return self._count
+
+    def build(self, items: Iterable[tuple[Rect, T]]):
+        """Replace the content of the index by ``items``"""
+        self._cells = {}
+        self._count = 0
+        for rect, item in items:
+            self.add(rect, item)
+
+    def add(self, rect: Rect, item: T):
+        x, y, w, h = rect
+        if w <= 0 or h <= 0:
+            return
+        entry = (rect, self._count, item)
+        self._count += 1
+        for key in self._keys(x, y, w, h):
+            self._cells.setdefault(key, []).append(entry)
+
+    def at(self, x: float, y: float) -> Optional[T]:
+        """Return the first item that contains the given point, or
+        ``None``"""
+        size = self.cell_size
+        for (rx, ry, rw, rh), _, item in \
+                self._cells.get((floor(x / size), floor(y / size)), ()):
+            if rx <= x < rx + rw and ry <= y < ry + rh:
+                return item
+        return None
+
+    def all_at(self, x: float, y: float) -> list[T]:
+        """Return all items that contain the given point, in insertion
+        order"""
+        size = self.cell_size
+        cell = self._cells.get((floor(x / size), floor(y / size)), ())
+        return [item for (rx, ry, rw, rh), _, item in cell
+                if rx <= x < rx + rw and ry <= y < ry + rh]
+
+    def intersecting(self, rect: Rect) -> list[T]:
+        """Return all items of which the rectangle overlaps ``rect``, in
+        insertion order"""
+        x, y, w, h = rect
+        found = {}
+        for key in self._keys(x, y, w, h):
+            for (rx, ry, rw, rh), k, item in self._cells.get(key, ()):
+                if rx < x + w and x < rx + rw and ry < y + h and y < ry + rh:
+                    found[k] = item
+        return [found[k] for k in sorted(found)]
+
+    def _keys(self, x, y, w, h) -> Iterable[tuple[int, int]]:
+        size = self.cell_size
+        x_0, y_0 = floor(x / size), floor(y / size)
+        # the right and bottom edges are not part of the rectangle
+        x_1, y_1 = ceil((x + w) / size), ceil((y + h) / size)
+        return ((i, j) for i in range(x_0, x_1) for j in range(y_0, y_1))
@@ -0,0 +1,194 @@
+from math import isfinite
+from collections.abc import Sequence, Iterator, Callable
+from functools import partial
+from datetime import datetime
+from io import StringIO
+from itertools import islice
+from typing import TextIO
+from locale import setlocale, localeconv, LC_ALL
+from ..utils import format_unit
+
+setlocale(LC_ALL, "")
+
+CHUNK_ROWS = 1000  # rows rendered at once when streaming
+_DEFAULT_FORMAT = "{x:.{d}g}"
+_TSV_UNIT_SPEC = "~P"
+
+
+class Table:
+    """The content of a table with column and row headers, and numerical data
+    that is formatted as configured per row and column. It is rendered as
+    html by :class:`~wxfrog.models.html.HtmlTable`, and as tab separated text
+    by :meth:`render_tsv`.
+
+    Units of measurement are kept as given, and formatted by the renderers.
+    """
+    def __init__(self, column_headers: Sequence[str],
+                 row_headers: Sequence[str],
+                 default_digits=6):
+        self.label = "Simulation"
+        self.title = ""
+        self.date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._column_headers = [column_headers]
+        self._top_rect_headings = None
+        self._row_headers = [row_headers]
+        self._unit_rows = set()  # indices of column headers with units
+        self._unit_columns = set()  # indices of row headers with units
+        self._vertical_lines = set()
+        self._row_format = {}
+        self._col_format = {}
+        self._default_digits = default_digits
+        self._data = None
+        self._threshold = [0.0] * len(row_headers)
+        self._nan = [""] * len(row_headers)
+        self._sub_threshold = [""] * len(row_headers)
+
+    def add_column_header_row(self, row: Sequence[str]):
+        assert len(row) == len(self._column_headers[0])
+        self._column_headers.append(row)
+
+    def add_row_header_column(self, column: Sequence[str]):
+        assert len(column) == len(self._row_headers[0])
+        self._row_headers.append(column)
+
+    def add_vertical_line(self, column: int):
+        self._vertical_lines.add(column)
+
+    def add_row_unit_column(self, units: Sequence[str]):
+        self._unit_columns.add(len(self._row_headers))
+        self.add_row_header_column(units)
+
+    def add_column_unit_row(self, units: Sequence[str]):
+        self._unit_rows.add(len(self._column_headers))
+        self.add_column_header_row(units)
+
+    def set_top_rect_headers(self, headings: Sequence[Sequence[str]]):
+        self._top_rect_headings = headings
+
+    def set_row_format(self, row: int, fmt: str):
+        self._row_format[row] = fmt
+
+    def set_col_format(self, col: int, fmt: str):
+        self._col_format[col] = fmt
+
+    def set_threshold(self, row, threshold: float):
+        assert threshold >= 0.0
+        self._threshold[row] = threshold
+
+    def set_nan(self, row, nan_string: str):
+        self._nan[row] = nan_string
+
+    def set_sub_threshold(self, row, sub_threshold_string: str):
+        self._sub_threshold[row] = sub_threshold_string
+
+    def set_data(self, data: Sequence[Sequence[float]]):
+        assert len(data) == len(self._row_headers[0])
+        num_cols = len(self._column_headers[0])
+        for d_r in data:
+            assert len(d_r) == num_cols
+        dp = localeconv()["decimal_point"]
+        result = []
+        for r, d_r in enumerate(data):
+            row_fmt = self._row_format.get(r, _DEFAULT_FORMAT)
+            fmt = self._compile(row_fmt, r, dp)
+            if not self._col_format:
+                result.append(list(map(fmt, d_r)))
+                continue
+            fmts = [fmt] * num_cols
+            for c, col_fmt in self._col_format.items():
+                fmts[c] = self._compile(col_fmt, r, dp)
+            result.append([f(d) for f, d in zip(fmts, d_r)])
+        self._data = result
+
+    def set_columns(self, columns: Sequence[Sequence[float]]):
+        """Set the data column-wise, for instance from the ``array`` or
+        ``memoryview`` columns of case study results. If no row specific
+        formatting is defined, each column is formatted in bulk."""
+        assert len(columns) == len(self._column_headers[0])
+        num_rows = len(self._row_headers[0])
+        for column in columns:
+            assert len(column) == num_rows
+        uniform = (not self._row_format and not any(self._threshold)
+                   and len(set(self._nan)) < 2)
+        if not uniform or not num_rows:
+            self.set_data([list(r) for r in zip(*columns)])
+            return
+        dp = localeconv()["decimal_point"]
+        formatted = [
+            list(map(self._compile(self._col_format.get(c, _DEFAULT_FORMAT),
+                                   0, dp), column))
+            for c, column in enumerate(columns)]
+        self._data = [list(r) for r in zip(*formatted)]
+
+    def column_header_rows(self, unit_spec: str) -> list[Sequence[str]]:
+        """Return the column header rows, with units formatted according to
+        the pint format specification ``unit_spec``"""
+        return [[format_unit(u, unit_spec) for u in row]
+                if k in self._unit_rows else row
+                for k, row in enumerate(self._column_headers)]
+
+    def row_header_columns(self, unit_spec: str) -> list[Sequence[str]]:
+        """Return the row header columns, with units formatted according to
+        the pint format specification ``unit_spec``"""
+        return [[format_unit(u, unit_spec) for u in column]
+                if k in self._unit_columns else column
+                for k, column in enumerate(self._row_headers)]
+
+    def top_rect_headings(self) -> Sequence[Sequence[str]]:
+        if self._top_rect_headings is None:
+            return [[""] * len(self._row_headers)] * len(self._column_headers)
+        return self._top_rect_headings
+
+    def render_tsv(self) -> str:
+        result = StringIO()
+        self.render_tsv_to(result)
+        return result.getvalue()
+
+    def render_tsv_to(self, file: TextIO, chunk_rows: int = CHUNK_ROWS):
+        for chunk in self.iter_render_tsv(chunk_rows):
+            file.write(chunk)
+
+    def iter_render_tsv(self, chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+        """Yield the table as tab separated text in chunks of ``chunk_rows``
+        rows. This is much more compact than html, but has no styling."""
+        def line(cells):
+            return "\t".join(c.replace("\t", " ") for c in cells) + "\n"
+
+        assert self._data is not None
+        yield line([f"{self.label}:", self.title])
+        yield line(["Date:", self.date])
+        yield "\n"
+        top = self.top_rect_headings()
+        headers = self.column_header_rows(_TSV_UNIT_SPEC)
+        assert len(top) == len(headers)
+        yield "".join(line([*t, *h]) for t, h in zip(top, headers))
+        row_headers = zip(*self.row_header_columns(_TSV_UNIT_SPEC))
+        rows = (line([*h, *d]) for h, d in zip(row_headers, self._data))
+        while chunk := list(islice(rows, chunk_rows)):
+            yield "".join(chunk)
+
+    def _compile(self, fmt: str, row: int, dp: str) -> Callable[[float], str]:
+        # return a function formatting a value, according to the format and
+        # the settings of given row.
+        nan, sub = self._nan[row], self._sub_threshold[row]
+        threshold = self._threshold[row]
+        if fmt == _DEFAULT_FORMAT:
+            render = f"{{:.{self._default_digits}g}}".format
+        else:
+            with_digits = partial(fmt.format, d=self._default_digits)
+            render = lambda x: with_digits(x=x)
+        if dp != ".":
+            plain = render
+            render = lambda x: plain(x).replace(".", dp)
+
+        if threshold:
+            def f(value: float) -> str:
+                if not isfinite(value):
+                    return nan
+                if abs(value) < threshold:
+                    return sub
+                return render(value)
+        else:
+            def f(value: float) -> str:
+                return render(value) if isfinite(value) else nan
+        return f
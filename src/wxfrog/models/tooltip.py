@@ -1,17 +1,24 @@
 from dataclasses import dataclass, field
+from typing import Optional, Protocol
 import wx
 
+
+class TooltipItem(Protocol):
+    """What is shown with a tooltip, like a label on the canvas"""
+    id: str
+
+
 @dataclass
 class TooltipInfo:
-    item: dict = None
-    counter: int = -1
+    item: Optional[TooltipItem] = None
+    visible: bool = False
     pos: wx.Point = field(default_factory=lambda: wx.Point(0, 0))
     pos_panel: wx.Point = field(default_factory=lambda: wx.Point(0, 0))
 
-    def is_for(self, item):
-        return self.item is not None and self.item["id"] == item["id"]
+    def is_for(self, item: TooltipItem):
+        return self.item is not None and self.item.id == item.id
 
-    def set_item(self, item):
+    def set_item(self, item: Optional[TooltipItem]):
         self.item = item
-        self.counter = -1
+        self.visible = False
 
@@ -3,6 +3,8 @@ from collections.abc import Sequence, MutableMapping, Mapping
 from io import TextIOBase, StringIO
 from threading import Lock
 from re import compile
+from functools import lru_cache
+from sys import intern
 
 import wx
 from pint import UnitRegistry, DimensionalityError
@@ -17,11 +19,15 @@ Path = tuple[str, ...]
 
 _unit_registry: Optional[UnitRegistry] = None
 
+UNIT_CACHE_SIZE = 1024
+
 
 def set_unit_registry(registry: UnitRegistry):
     global _unit_registry
     registry.autoconvert_offset_to_baseunit = True
     _unit_registry = registry
+    parse_unit.cache_clear()
+    format_unit.cache_clear()
 
 
 def get_unit_registry() -> UnitRegistry:
@@ -30,9 +36,68 @@ def get_unit_registry() -> UnitRegistry:
     return _unit_registry
 
 
-def fmt_unit(unit: Unit):
-    result = f"{unit:~P#}"
-    return result.replace(" ", "")
+@lru_cache(maxsize=UNIT_CACHE_SIZE)
+def parse_unit(unit: str) -> Unit:
+    """Return the unit of the given string in the active unit registry.
+    The result is cached, as only a few distinct units occur in a model."""
+    return get_unit_registry().Unit(unit)
+
+
+@lru_cache(maxsize=UNIT_CACHE_SIZE)
+def format_unit(unit: Unit | str, spec: str) -> str:
+    """Return the unit formatted by the pint format specification ``spec``,
+    cached per unit and specification. Units given as string are parsed
+    first."""
+    if isinstance(unit, str):
+        unit = parse_unit(unit)
+    return f"{unit:{spec}}"
+
+
+class PathTable:
+    """Registry of interned path tuples, each associated with a small integer
+    id. Scenarios, case studies and views all refer to the same leaves of the
+    model, so sharing one tuple object per path (and keying internal
+    structures by its id) saves memory and hashing."""
+    def __init__(self):
+        self._ids: dict[Path, int] = {}
+        self._paths: list[Path] = []
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._paths)
+
+    def id_of(self, path: Sequence[str]) -> int:
+        """Return the id of the given path, registering it if necessary"""
+        path = tuple(path)
+        try:
+            return self._ids[path]
+        except KeyError:
+            pass
+        with self._lock:  # case studies run in separate threads
+            if (id_ := self._ids.get(path)) is None:
+                id_ = len(self._paths)
+                path = tuple(map(intern, path))
+                self._paths.append(path)
+                self._ids[path] = id_
+        return id_
+
+    def path_of(self, id_: int) -> Path:
+        return self._paths[id_]
+
+    def intern(self, path: Sequence[str]) -> Path:
+        """Return the shared tuple instance that is equal to ``path``"""
+        return self._paths[self.id_of(path)]
+
+
+_path_table = PathTable()
+
+
+def get_path_table() -> PathTable:
+    return _path_table
+
+
+def fmt_unit(unit: Unit | str):
+    return format_unit(unit, "~P#").replace(" ", "")
 
 
 class ThreadedStringIO(TextIOBase):
@@ -62,8 +127,9 @@ class ThreadedStringIO(TextIOBase):
 
 
 class PathFilter:
-    DOUBLE_STAR = r"([^.]+(\.[^.]+)<star>)"
     SINGLE_STAR = r"[^.]+"
+    _MULTI = None  # segment matcher representing ``**``
+    _META = set(".^$*+?{}[]\\|()")
 
     def __init__(self, search_term: str):
         """Create a filter with given search term. Examples are:
@@ -76,23 +142,130 @@ class PathFilter:
           and have ``x`` as the second-last element, such as the path
           ``Synthesis/Reactor/Outlet/x/MeOH``.
 
+        The term is compiled into one matcher per path element. Walking a
+        path advances a set of positions in that sequence, such that whole
+        subtrees can be skipped as soon as no position is left.
+
+        Hence, ``**`` only spans several elements as a segment on its own.
+        Within a segment, as in ``a**b``, each asterisk is a place-holder
+        within that single element, so ``a**b`` matches ``aXYb``, but not
+        ``a.X.b`` anymore, as it did in earlier versions.
         """
         if search_term:
-            st = search_term.replace("\\*", "\\<star>")
-            st = st.replace("**", self.DOUBLE_STAR)
-            st = st.replace("*", self.SINGLE_STAR)
-            st = st.replace("<star>", "*")
-            self._pattern = compile(f"^{st}$")
-            print(st)
+            self._segments = [self._compile_segment(s)
+                              for s in search_term.split(".")]
+            self._start = frozenset([0])
         else:
-            self._pattern = None
+            self._segments = None
+            self._start = None
+        self._transitions = {}
+
+    @classmethod
+    def _compile_segment(cls, segment: str):
+        if segment == "**":
+            return cls._MULTI
+        if not cls._META.intersection(segment):
+            return segment  # literal, compared by equality
+        st = segment.replace("\\*", "\\<star>")
+        st = st.replace("*", cls.SINGLE_STAR)
+        st = st.replace("<star>", "*")
+        return compile(st)
+
+    def _advance(self, states: frozenset[int], key: str) -> frozenset[int]:
+        """Return the positions reached from ``states`` by consuming the path
+        element ``key``. Transitions are cached, as the same keys are visited
+        over and over again in typical result structures."""
+        try:
+            return self._transitions[(states, key)]
+        except KeyError:
+            pass
+        result = set()
+        segments = self._segments
+        for i in states:
+            if i == len(segments):
+                continue
+            seg = segments[i]
+            if seg is self._MULTI:
+                result.update((i, i + 1))
+            elif seg == key if isinstance(seg, str) else seg.fullmatch(key):
+                result.add(i + 1)
+        result = frozenset(result)
+        self._transitions[(states, key)] = result
+        return result
+
+    def _accepts(self, states: frozenset[int]) -> bool:
+        return len(self._segments) in states
 
     def matches(self, path: Sequence[str]) -> bool:
         """Return ``True`` if the path - as is -  is matched by the search term.
         """
-        if self._pattern is None:
+        if self._segments is None:
+            return True
+        states = self._start
+        for key in path:
+            states = self._advance(states, key)
+            if not states:
+                return False
+        return self._accepts(states)
+
+    def narrows(self, previous: "PathFilter") -> bool:
+        """Return ``True`` if all paths matched by this filter are certainly
+        matched by the ``previous`` one, such that it can be applied to the
+        result of the previous filter instead of the entire structure.
+
+        The check is conservative: The segments of this term are fed to the
+        previous filter, only following transitions that hold for all path
+        elements a segment can match. ``False`` is returned if in doubt.
+        """
+        if previous._segments is None:
             return True
-        return self._pattern.match(".".join(path)) is not None
+        if self._segments is None:
+            return False
+        before = previous._segments
+        states = previous._start
+        for seg in self._segments:
+            reached = set()
+            for i in states:
+                if i == len(before):
+                    continue
+                other = before[i]
+                if other is self._MULTI:
+                    reached.update((i, i + 1))
+                elif seg is self._MULTI:
+                    continue  # a single element can't cover many
+                elif isinstance(seg, str):
+                    if (other == seg if isinstance(other, str)
+                            else other.fullmatch(seg)):
+                        reached.add(i + 1)
+                elif not isinstance(other, str) and \
+                        other.pattern == seg.pattern:
+                    reached.add(i + 1)
+            if not reached:
+                return False
+            states = reached
+        return previous._accepts(states)
+
+    def apply(self, structure: Mapping) -> Optional[dict]:
+        """Return a nested copy of ``structure``, only containing the leaves
+        matched by the search term, or ``None`` if nothing matches. Empty
+        sub-structures are omitted."""
+        def dive(struct, states):
+            if not isinstance(struct, Mapping):
+                matched = states is None or self._accepts(states)
+                return struct if matched else None
+            result = {}
+            for k, v in struct.items():
+                if states is None:
+                    sub = dive(v, None)
+                elif next_states := self._advance(states, k):
+                    sub = dive(v, next_states)
+                else:
+                    continue  # prune entire subtree
+                if sub is not None:
+                    result[k] = sub
+            return result if result else None
+
+        return dive(structure, self._start)
 
 
 class DataStructure(dict, NestedQuantityMap):
@@ -106,6 +279,10 @@ class DataStructure(dict, NestedQuantityMap):
         node = self.get(path[:-1])
         node[path[-1]] = value
 
+    def copy_tree(self) -> Self:
+        """Return a copy of the nested structure, sharing the leaf values"""
+        return DataStructure(self._dive(lambda x: x)(self))
+
     def to_jsonable(self) -> NestedStringMap:
         dive = self._dive(lambda x: f"{x:.14g~}")
         return dive(self)
@@ -130,9 +307,10 @@ class DataStructure(dict, NestedQuantityMap):
             for k, v in struct.items():
                 p = path + [k]
                 if dive(v, p):
-                    paths.append(tuple(p))
+                    paths.append(table.intern(p))
             return False
 
+        table = get_path_table()
         paths = []
         dive(self, [])
         return paths
@@ -151,7 +329,19 @@ class DataStructure(dict, NestedQuantityMap):
                 return func(struct)
         return dive
 
-def copy_html_to_clipboard(html):
+CLIPBOARD_MARKUP = "markup"
+CLIPBOARD_TEXT = "text"
+CLIPBOARD_HTML = "html"
+CLIPBOARD_BOTH = "both"
+CLIPBOARD_ASK = "ask"
+
+
+def copy_table_to_clipboard(table, fmt: str = CLIPBOARD_MARKUP):
+    """Copy the table into the clipboard, by default as html markup in plain
+    text, which Excel interprets as table. Otherwise, it is copied as tab
+    separated text, html, or both. With both, the pasting application picks
+    the format it supports best, as for instance LibreOffice prefers html.
+    """
     def fill_clipboard():
         if wx.TheClipboard.Open():
             wx.TheClipboard.SetData(data_obj)
@@ -160,12 +350,14 @@ def copy_html_to_clipboard(html):
             wx.MessageDialog(None, "Clipboard not available", "Copy error",
                              style=wx.OK | wx.ICON_ERROR).ShowModal()
 
-    # TODO: make it an option whether to copy in html or text format.
-    #  Excel requires text, while LibreOffice requires html.
-    if True:
-        data_obj = wx.TextDataObject(html)
+    if fmt == CLIPBOARD_MARKUP:
+        data_obj = wx.TextDataObject(table.render())
+    elif fmt == CLIPBOARD_TEXT:
+        data_obj = wx.TextDataObject(table.render_tsv())
+    elif fmt == CLIPBOARD_HTML:
+        data_obj = wx.HTMLDataObject(table.render())
     else:
-        html_format = wx.DataFormat(wx.DF_HTML)
-        data_obj = wx.CustomDataObject(html_format)
-        data_obj.SetData(html.encode("utf-8"))
+        data_obj = wx.DataObjectComposite()
+        data_obj.Add(wx.HTMLDataObject(table.render()), preferred=True)
+        data_obj.Add(wx.TextDataObject(table.render_tsv()))
     wx.CallLater(100, fill_clipboard)
\ No newline at end of file
@@ -1,6 +1,9 @@
 from typing import Any, Callable
 import wx
 from wx.core import PyEventBinder
+from pubsub import pub
+
+from ..events import EXPORT_PROGRESS, EXPORT_ENDED
 
 class PopupBase(wx.Dialog):
     """Abstract base class to open a transient window, covering a specific
@@ -69,4 +72,39 @@ class APoint(wx.Point):
 
 class ASize(wx.Size):
     def __floordiv__(self, other: int):
-        return ASize(self.x // other, self.y // other)
\ No newline at end of file
+        return ASize(self.x // other, self.y // other)
+
+class ExportProgressDialog(wx.ProgressDialog):
+    """Show the progress of a file export running in a background thread"""
+    _MSG = "{what} written: {k}/{m}"
+
+    def __init__(self, maximum: int, interrupt: Callable[[], None],
+                 what: str = "Rows"):
+        style = wx.PD_CAN_ABORT | wx.PD_ELAPSED_TIME | wx.PD_AUTO_HIDE
+        super().__init__("Export progress",
+                         self._MSG.format(what=what, k=0, m=maximum),
+                         maximum=max(maximum, 1), parent=None, style=style)
+        self._max = maximum
+        self._what = what
+        self._interrupt = interrupt
+        pub.subscribe(self._update, EXPORT_PROGRESS)
+        pub.subscribe(self._ended, EXPORT_ENDED)
+
+    def _destroy(self):
+        pub.unsubscribe(self._update, EXPORT_PROGRESS)
+        pub.unsubscribe(self._ended, EXPORT_ENDED)
+        self.Destroy()
+
+    def _update(self, k: int):
+        # called from export thread
+        def do_update():
+            if k >= self._max:
+                return  # closed when export has ended
+            msg = self._MSG.format(what=self._what, k=k, m=self._max)
+            res, _ = self.Update(k, msg)
+            if not res:
+                self._interrupt()
+        wx.CallAfter(do_update)
+
+    def _ended(self, message):
+        wx.CallAfter(self._destroy)
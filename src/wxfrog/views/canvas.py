@@ -1,5 +1,6 @@
-from collections.abc import MutableMapping, Set
-from typing import Any
+from collections.abc import Mapping, Set, Sequence
+from math import ceil, floor
+from typing import Any, Optional
 from pint.registry import Quantity
 
 import wx
@@ -7,15 +8,21 @@ from pubsub.pub import sendMessage
 
 from ..config import Configuration
 from ..events import SHOW_PARAMETER_IN_CANVAS
-from ..utils import DataStructure, fmt_unit, get_unit_registry
+from ..utils import DataStructure, fmt_unit, parse_unit
 from ..models.tooltip import TooltipInfo
+from ..models.spatial import GridIndex
 
 from .parameter import ParameterDialog
 from .colors import INPUT_BLUE, BLACK, ERROR_RED, LIGHT_GREY
 from .auxiliary import APoint, ASize
-
-_TOOLTIP_CHECK_INTERVAL = 200  # ms
-_TOOLTIP_DURATION = 5  # times check interval -> duration after hover
+from .image import TiledImageWrap
+
+_TOOLTIP_DELAY = 200  # ms hovering over a label until tooltip is shown
+_TOOLTIP_DURATION = 1000  # ms the tooltip stays after leaving the label
+_REFRESH_MARGIN = 2  # pixels around label rectangles, for anti-aliasing
+_EXTENT_CACHE_SIZE = 10000  # text extents to remember
+_MIN_LABEL_HEIGHT = 6  # pixels on screen, labels are hidden if smaller
+ZOOM_LEVELS = (0.1, 0.15, 0.25, 0.35, 0.5, 0.7, 1, 1.4, 2, 3, 4)
 PROP_STUB = """
   - path: []
     uom: ""
@@ -23,6 +30,46 @@ PROP_STUB = """
     fmt: "{{:.2f~P}}"
 """[1:]
 
+
+class CanvasLabel:
+    """A label on the canvas, showing the value of a parameter or result as
+    configured by ``item``. The label persists across updates, and its text
+    is only formatted again if the value changed."""
+    def __init__(self, item: Mapping[str, Any]):
+        self.path = tuple(item["path"])
+        self.id = ".".join(self.path)
+        self.item = {"name": self.id, **item}
+        self.pos = tuple(item["pos"])
+        self.text: Optional[str] = None  # None if the value is missing
+        self.hitbox: Optional[wx.Rect] = None
+        self._unit = item["uom"]
+        self._format = item["fmt"].format
+        self._value: Optional[Quantity] = None
+
+    @property
+    def name(self) -> str:
+        return self.item["name"]
+
+    def update(self, values: DataStructure) -> bool:
+        """Look up the value in ``values`` and return whether the text
+        changed"""
+        try:
+            value = values.get(self.path)
+        except KeyError:
+            value = None
+        old = self._value
+        if value is None or old is None:
+            if value is old:
+                return False
+        elif value.m == old.m and value.units == old.units:
+            return False
+        self._value = value
+        text = None if value is None else \
+            self._format(value.to(parse_unit(self._unit)))
+        changed, self.text = text != self.text, text
+        return changed
+
+
 class Canvas(wx.ScrolledWindow):
     RESULT_VALID = 0
     RESULT_INVALID = 1
@@ -31,15 +78,21 @@ class Canvas(wx.ScrolledWindow):
     def __init__(self, parent: wx.Window, config: Configuration):
         super().__init__(parent)
         self.config = config
-        self._result_labels = []
+        self.zoom = 1.0
+        self._result_labels, self._parameter_labels = self._create_labels()
+        self._offscreen_labels = None  # for snapshots, created on demand
         self._results_mode = False
-        self._parameter_labels = []
+        self._label_index = GridIndex()  # of (which, label) by hitbox
         self._dirty_parameter_ids = set()
         self._tooltip = TooltipInfo()
 
         # configure bg picture
         self.background = config.get_image(config["bg_picture_name"])
         self.bg_size = config.get_image_size(self.background)
+        bg_color = wx.Colour(config.get("bg_color", "white"))
+        self._tiles = TiledImageWrap(self.background, bg_color)
+        self._tooltip_rect = None  # where the tooltip was drawn last
+        self._create_resources()
 
         panel = wx.Panel(self)
         panel.SetSize(self.bg_size)
@@ -54,22 +107,27 @@ class Canvas(wx.ScrolledWindow):
         self.SetScrollRate(50, 50)
 
         panel.Bind(wx.EVT_PAINT, self._on_paint)
+        panel.Bind(wx.EVT_DPI_CHANGED, self._on_dpi_changed)
         self.Bind(wx.EVT_SCROLLWIN, self._on_scroll)
         self.Bind(wx.EVT_SCROLL_THUMBRELEASE, self._on_scroll)
         self.Bind(wx.EVT_SCROLL_CHANGED, self._on_scroll)
 
         self.Bind(wx.EVT_MOUSEWHEEL, self._on_mousewheel)
         panel.Bind(wx.EVT_LEFT_DOWN, self._on_left_click)
+        panel.Bind(wx.EVT_MOTION, self._on_motion)
+        panel.Bind(wx.EVT_LEAVE_WINDOW, self._on_leave)
         def set_size():
-            self.SetVirtualSize(self.bg_size)
+            self.SetVirtualSize(self._zoomed(self.bg_size))
 
         wx.CallLater(50, set_size)
 
-        self._tool_tip_timer = wx.Timer()
-        self._tool_tip_timer.Start(_TOOLTIP_CHECK_INTERVAL)
+        # one-shot timers, only running while a tooltip is pending or shown
+        self._show_timer = wx.Timer()
+        self._hide_timer = wx.Timer()
 
         parent.Bind(wx.EVT_CLOSE, self._on_close)
-        self._tool_tip_timer.Bind(wx.EVT_TIMER, self._on_check_tooltip)
+        self._show_timer.Bind(wx.EVT_TIMER, self._on_show_tooltip)
+        self._hide_timer.Bind(wx.EVT_TIMER, self._on_hide_tooltip)
 
     def _on_scroll(self, event):
         self.panel.Update()
@@ -77,39 +135,62 @@ class Canvas(wx.ScrolledWindow):
         self.Refresh()
         event.Skip()
 
+    def _on_dpi_changed(self, event):
+        self.invalidate_background()
+        event.Skip()
+
     def _on_close(self, event):
-        # stop timer, or else it can still fire an event and trigger access
-        # to destroyed canvas object
-        self._tool_tip_timer.Stop()
+        # stop timers, or else they can still fire an event and trigger
+        # access to destroyed canvas object
+        self._show_timer.Stop()
+        self._hide_timer.Stop()
         event.Skip()
 
-    def _on_check_tooltip(self, event):
-        def process(e):
-            if not tooltip.is_for(e):
-                tooltip.set_item(e)
-            else:
-                if tooltip.counter <= 0:
-                    tooltip.pos = pos_canvas
-                    tooltip.pos_panel = pos
-                tooltip.counter = _TOOLTIP_DURATION  # reset counter
-            self.Refresh()  # tooltip visibility changed
+    def _on_motion(self, event: wx.MouseEvent):
+        event.Skip()
+        tooltip = self._tooltip
+        pos = event.GetPosition()  # panel spans the virtual canvas
+        found = self._label_at(pos)
+        if found is None:
+            self._leave_label()
+            return
+        self._hide_timer.Stop()
+        if tooltip.is_for(found[1]):
+            if not tooltip.visible:
+                tooltip.pos = pos
+            return
+        if tooltip.visible:
+            self._on_hide_tooltip(None)
+        tooltip.set_item(found[1])
+        tooltip.pos = pos
+        self._show_timer.StartOnce(_TOOLTIP_DELAY)
+
+    def _on_leave(self, event: wx.MouseEvent):
+        self._leave_label()
+        event.Skip()
 
+    def _leave_label(self):
         tooltip = self._tooltip
-        tooltip.counter -= 1
-        if tooltip.counter == 0:
-            self.Refresh()  # tooltip no longer visible
-
-        pos = self.ScreenToClient(wx.GetMousePosition())
-        pos_canvas = self._get_pos(pos)
-        for item in self._result_labels + self._parameter_labels:
-            try:
-                if item["hitbox"].Contains(pos_canvas):
-                    process(item)
-                    return
-            except KeyError:
-                pass
-        # self.panel.Refresh(False)
-        # self.panel.Update()
+        self._show_timer.Stop()
+        if not tooltip.visible:
+            tooltip.set_item(None)
+        elif not self._hide_timer.IsRunning():
+            self._hide_timer.StartOnce(_TOOLTIP_DURATION)
+
+    def _on_show_tooltip(self, event):
+        tooltip = self._tooltip
+        if tooltip.item is None:
+            return
+        tooltip.pos_panel = self.ScreenToClient(
+            self.panel.ClientToScreen(tooltip.pos))
+        tooltip.visible = True
+        self._refresh_tooltip()
+
+    def _on_hide_tooltip(self, event):
+        self._show_timer.Stop()
+        self._hide_timer.Stop()
+        self._tooltip.set_item(None)
+        self._refresh_tooltip()
 
     def _on_left_click(self, event: wx.MouseEvent):
         pos = event.GetPosition()
@@ -118,7 +199,8 @@ class Canvas(wx.ScrolledWindow):
         # with <ctrl>-key.
 
         if event.ControlDown():
-            text = PROP_STUB.format(x=pos[0], y=pos[1])
+            x, y = self._to_canvas(pos)
+            text = PROP_STUB.format(x=int(x), y=int(y))
             data_obj = wx.TextDataObject(text)
             print(text)
 
@@ -129,21 +211,27 @@ class Canvas(wx.ScrolledWindow):
                 print("Clipboard not available!")
             return
 
-        for item in self._result_labels:
-            if item["hitbox"].Contains(pos):
-                print(item["label"])
+        if not self._labels_shown(self.zoom):
+            return
+        for which, item in self._label_index.all_at(*self._to_canvas(pos)):
+            if which == "results":
+                print(item.text)
                 # TODO: process e.g. by asking for values for other scenarios
                 #  .. fire this as an event to controller, including mouse
                 #     position and path. Controller then calls back to show
                 #     tooltip with values for each scenario.
-
-        for item in self._parameter_labels:
-            if item["hitbox"].Contains(pos):
+            else:
                 sendMessage(SHOW_PARAMETER_IN_CANVAS, item=item)
 
 
     def _on_mousewheel(self, event: wx.MouseEvent):
-        if event.ShiftDown(): # horizontal scroll
+        if event.ControlDown():  # zoom around mouse position
+            anchor = self.ScreenToClient(wx.GetMousePosition())
+            if event.GetWheelRotation() > 0:
+                self.zoom_in(anchor)
+            else:
+                self.zoom_out(anchor)
+        elif event.ShiftDown(): # horizontal scroll
             delta = event.GetWheelRotation()
             # positive delta = wheel up -> scroll left (negative)
             units = self.GetScrollPixelsPerUnit()[0]
@@ -152,59 +240,179 @@ class Canvas(wx.ScrolledWindow):
         else:  # default vertical scroll
             event.Skip()
 
-    def draw_content(self, gc: wx.GraphicsContext):
-        """Draw the SVG and all overlays onto the given GraphicsContext."""
+    def zoom_in(self, anchor: wx.Point = None):
+        larger = [z for z in ZOOM_LEVELS if z > self.zoom * 1.01]
+        if larger:
+            self.set_zoom(larger[0], anchor)
+
+    def zoom_out(self, anchor: wx.Point = None):
+        smaller = [z for z in ZOOM_LEVELS if z < self.zoom / 1.01]
+        if smaller:
+            self.set_zoom(smaller[-1], anchor)
+
+    def set_zoom(self, zoom: float, anchor: wx.Point = None):
+        """Set the zoom factor. The point of the canvas at the window
+        position ``anchor``, by default the centre, stays in place."""
+        if anchor is None:
+            width, height = self.GetClientSize()
+            anchor = wx.Point(width // 2, height // 2)
+        x, y = self._to_canvas(self._get_pos(anchor))
+        self._on_hide_tooltip(None)
+        self.zoom = zoom
+        size = self._zoomed(self.bg_size)
+        self.panel.SetMinSize(size)
+        self.panel.SetMaxSize(size)
+        self.panel.SetSize(size)
+        self.SetVirtualSize(size)
+        sx, sy = self.GetScrollPixelsPerUnit()
+        self.Scroll(max(0, round((x * zoom - anchor[0]) / sx)),
+                    max(0, round((y * zoom - anchor[1]) / sy)))
+        self.panel.Refresh()
+
+    def _zoomed(self, size: wx.Size) -> wx.Size:
+        return wx.Size(round(size.width * self.zoom),
+                       round(size.height * self.zoom))
+
+    def _to_canvas(self, pos: wx.Point) -> tuple[float, float]:
+        """Convert a position on the panel into unzoomed canvas
+        coordinates, as used in the configuration"""
+        return pos[0] / self.zoom, pos[1] / self.zoom
+
+    def _labels_shown(self, zoom: float) -> bool:
+        # level of detail: labels too small to read are not drawn
+        return self._text_extent("label", "0").height * zoom \
+            >= _MIN_LABEL_HEIGHT
+
+    def _label_at(self, pos: wx.Point):
+        if not self._labels_shown(self.zoom):
+            return None
+        return self._label_index.at(*self._to_canvas(pos))
+
+    def draw_content(self, gc: wx.GraphicsContext,
+                     rect: tuple[float, float, float, float] = None,
+                     zoom: float = 1.0):
+        """Draw the SVG and all overlays onto the given GraphicsContext.
+
+        Only labels intersecting ``rect``, given in canvas coordinates, are
+        drawn, and no labels at all if they were too small at given zoom
+        factor. By default, the entire canvas is drawn."""
+        if rect is None:
+            results = self._result_labels
+            parameters = self._parameter_labels
+        else:
+            visible = self._label_index.intersecting(rect)
+            results = [e for w, e in visible if w == "results"]
+            parameters = [e for w, e in visible if w == "parameters"]
+        scale = self.panel.GetContentScaleFactor() * zoom
+        self._draw(gc, results, parameters, self._results_mode,
+                   self._dirty_parameter_ids, rect, zoom, scale)
+
+    def render_background(self) -> wx.Bitmap:
+        """Render the background in actual size, bypassing the tiles of the
+        display, e.g. to be reused for many snapshots"""
+        w, h = self.bg_size
+        return self._tiles.image.render_region(
+            wx.Rect(0, 0, w, h), self.bg_size, self._tiles.background)
+
+    def render_snapshot(self, parameters: DataStructure,
+                        results: DataStructure,
+                        background: wx.Bitmap = None) -> wx.Image:
+        """Render the canvas off-screen in actual size, showing the given
+        values instead of the current ones. The displayed canvas is not
+        affected. The labels are drawn onto a copy of ``background`` if
+        given, as obtained by :meth:`render_background`."""
+        if self._offscreen_labels is None:
+            self._offscreen_labels = self._create_labels()
+        result_labels, parameter_labels = self._offscreen_labels
+        self._update_labels(result_labels, results, "label")
+        self._update_labels(parameter_labels, parameters, "bold")
+        bmp = self._render_offscreen(result_labels, parameter_labels,
+                                     self.RESULT_VALID, set(), background)
+        return bmp.ConvertToImage()
+
+    def _render_offscreen(self, results, parameters, mode, dirty_ids,
+                          background: wx.Bitmap = None) -> wx.Bitmap:
+        w, h = self.bg_size
+        if background is None:
+            bmp = wx.Bitmap(w, h)
+        else:
+            bmp = background.GetSubBitmap(wx.Rect(0, 0, w, h))  # a copy
+        mdc = wx.MemoryDC(bmp)
+        if background is None:
+            mdc.Clear()
+        gc = wx.GraphicsContext.Create(mdc)
+        # one pixel per unit, so tiles are shared with unzoomed display
+        self._draw(gc, results, parameters, mode, dirty_ids,
+                   with_background=background is None)
+        del gc
+        mdc.SelectObject(wx.NullBitmap)
+        return bmp
+
+    def _draw(self, gc: wx.GraphicsContext, results: Sequence[CanvasLabel],
+              parameters: Sequence[CanvasLabel], mode: int,
+              dirty_ids: Set[str],
+              rect: tuple[float, float, float, float] = None,
+              zoom: float = 1.0, scale: float = 1.0,
+              with_background: bool = True):
         def draw_labels(which, font_clean, color_clean,
                         font_dirty=None, color_dirty=None):
             font_dirty = font_clean if font_dirty is None else font_dirty
             color_dirty = color_clean if color_dirty is None else color_dirty
+            # converted for this context once, not for each label
+            clean = gc.CreateFont(font_clean, color_clean)
+            dirty = gc.CreateFont(font_dirty, color_dirty)
             for e in which:
-                dirty = e["id"] in self._dirty_parameter_ids
-                gc.SetFont(font_dirty if dirty else font_clean,
-                           color_dirty if dirty else color_clean)
-                gc.DrawText(e["label"], *e["pos"])
-                if "hitbox" not in e:
-                    extent = gc.GetFullTextExtent(e["label"])
-                    size = wx.Size(int(extent[0]), int(extent[1]))
-                    e["hitbox"] = wx.Rect(wx.Point(*e["pos"]), size)
-
-        # fill background explicitly
-        bg = wx.Colour(self.config.get("bg_color", "white"))
-        gc.SetBrush(gc.CreateBrush(wx.Brush(bg)))
-        gc.SetPen(wx.TRANSPARENT_PEN)
-        gc.DrawRectangle(0, 0, *self.panel.GetSize())
-        # load background picture
-        self.background.render_to_gc(gc, size=self.bg_size)
-
-        # draw calculated properties
-        font_size = self.config.get("font_size", 12)
-        font = wx.Font(
-            font_size, wx.FONTFAMILY_DEFAULT,
-            wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, False)
-        color = {self.RESULT_INVALID: LIGHT_GREY,
-                 self.RESULT_VALID: BLACK,
-                 self.RESULT_ERROR: ERROR_RED}[self._results_mode]
+                if e.text is None:
+                    continue
+                gc.SetFont(dirty if e.id in dirty_ids else clean)
+                gc.DrawText(e.text, *e.pos)
 
-        draw_labels(self._result_labels, font, color)
-        draw_labels(self._parameter_labels, font, INPUT_BLUE, font.Bold())
+        gc.PushState()
+        gc.Scale(zoom, zoom)
+        # background colour and picture, rasterised in tiles once
+        if with_background:
+            self._tiles.render_to_gc(gc, self.bg_size, rect, scale)
 
-        self._draw_tooltip(gc)
+        # draw calculated properties
+        if self._labels_shown(zoom):
+            fonts = self._fonts
+            color = self._result_colors[mode]
+            draw_labels(results, fonts["label"], color)
+            draw_labels(parameters, fonts["label"], INPUT_BLUE, fonts["bold"])
+        gc.PopState()
+
+    def invalidate_background(self):
+        """Discard the rasterised background, such that it is rendered again
+        with the next paint event"""
+        self._tiles.clear()
 
     def _draw_tooltip(self, gc: wx.GraphicsContext):
-        unit_cls = get_unit_registry().Unit
         tooltip = self._tooltip
-        if tooltip.counter <= 0:
+        if not tooltip.visible:
+            self._tooltip_rect = None
             return
-        item = tooltip.item
+        tip, pos, size = self._tooltip_layout()
+        self._tooltip_rect = wx.Rect(*pos, *size)
+
+        gc.SetPen(self._tooltip_pen)
+        gc.SetBrush(self._tooltip_brush)
+        gc.DrawRoundedRectangle(pos[0], pos[1], size[0], size[1], 4)
+        gc.SetFont(self._fonts["tooltip"], INPUT_BLUE)
+        gc.DrawText(tip, pos[0] + 4, pos[1] + 2)
+
+    def _tooltip_layout(self) -> tuple[str, APoint, ASize]:
+        """Return text, position and size of the tooltip"""
+        tooltip = self._tooltip
+        label = tooltip.item
         pos = APoint.from_point(tooltip.pos)
         try:
-            tip = item["tip"]
+            tip = label.item["tip"]
         except KeyError:
-            uom = fmt_unit(unit_cls(item["uom"]))
-            tip = f"{item['name']} [{uom}]"
-        tip = f"{tip}\n{item['label']}"
-        extent = gc.GetFullTextExtent(tip)
-        size = ASize(int(extent[0]) + 8, int(extent[1]) + 4)
+            uom = fmt_unit(label.item["uom"])
+            tip = f"{label.name} [{uom}]"
+        tip = f"{tip}\n{label.text}"
+        extent = self._text_extent("tooltip", tip)
+        size = ASize(extent.width + 8, extent.height + 4)
         pos -= size // 2
         p_pos = APoint.from_point(tooltip.pos_panel)
 
@@ -219,22 +427,78 @@ class Canvas(wx.ScrolledWindow):
             pos.x -= dx
         if (dy:= rect[1].y - canvas_size.y) > 0:
             pos.y -= dy
-
-        gc.SetPen(wx.Pen(INPUT_BLUE))
-        gc.SetBrush(wx.Brush(LIGHT_GREY))
-        gc.DrawRoundedRectangle(pos[0], pos[1], size[0], size[1], 4)
+        return tip, pos, size
+
+    def _refresh_tooltip(self):
+        """Invalidate the area of the tooltip as drawn last, and as to be
+        drawn now. The tooltip is not zoomed."""
+        if self._tooltip_rect is not None:
+            self._refresh_panel_rect(self._tooltip_rect)
+        if self._tooltip.visible:
+            _, pos, size = self._tooltip_layout()
+            self._refresh_panel_rect(wx.Rect(*pos, *size))
+
+    def _create_resources(self):
+        # fonts, pens and brushes, created once for the configuration
         font_size = self.config.get("font_size", 12)
-        font = wx.Font(
-            font_size, wx.FONTFAMILY_DEFAULT,
-            wx.FONTSTYLE_SLANT, wx.FONTWEIGHT_NORMAL, False)
-        gc.SetFont(font, INPUT_BLUE)
-        gc.DrawText(tip, pos[0] + 4, pos[1] + 2)
+        label = wx.Font(font_size, wx.FONTFAMILY_DEFAULT,
+                        wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL, False)
+        tooltip = wx.Font(font_size, wx.FONTFAMILY_DEFAULT,
+                          wx.FONTSTYLE_SLANT, wx.FONTWEIGHT_NORMAL, False)
+        self._fonts = {"label": label, "bold": label.Bold(),
+                       "tooltip": tooltip}
+        self._result_colors = {self.RESULT_INVALID: LIGHT_GREY,
+                               self.RESULT_VALID: BLACK,
+                               self.RESULT_ERROR: ERROR_RED}
+        self._tooltip_pen = wx.Pen(INPUT_BLUE)
+        self._tooltip_brush = wx.Brush(LIGHT_GREY)
+        self._measure_gc = None  # created on demand
+        self._extents: dict[tuple[str, str], wx.Size] = {}
+
+    def _text_extent(self, font: str, text: str) -> wx.Size:
+        """Return the size of ``text`` drawn with the font of given name,
+        rounded up to full pixels"""
+        key = (font, text)
+        try:
+            return self._extents[key]
+        except KeyError:
+            pass
+        if self._measure_gc is None:
+            self._measure_gc = wx.GraphicsContext.Create()
+        if len(self._extents) >= _EXTENT_CACHE_SIZE:
+            self._extents.clear()  # labels of old results, mostly
+        self._measure_gc.SetFont(self._fonts[font], BLACK)
+        width, height, *_ = self._measure_gc.GetFullTextExtent(text)
+        size = self._extents[key] = wx.Size(ceil(width), ceil(height))
+        return size
+
+    def _refresh_rect(self, rect: wx.Rect):
+        """Invalidate ``rect`` given in canvas coordinates"""
+        zoom = self.zoom
+        x, y = floor(rect.x * zoom), floor(rect.y * zoom)
+        self._refresh_panel_rect(
+            wx.Rect(x, y, ceil(rect.Right * zoom) - x + 1,
+                    ceil(rect.Bottom * zoom) - y + 1))
+
+    def _refresh_panel_rect(self, rect: wx.Rect):
+        rect = wx.Rect(rect).Inflate(_REFRESH_MARGIN)  # don't alter original
+        self.panel.RefreshRect(rect, eraseBackground=False)
+
+    def _refresh_label(self, label: CanvasLabel):
+        if label.hitbox is not None:
+            self._refresh_rect(label.hitbox)
 
     def _on_paint(self, event):
         dc = wx.AutoBufferedPaintDC(self.panel)
         dc.Clear()
         gc = wx.GraphicsContext.Create(dc)
-        self.draw_content(gc)
+        # only what needs repainting, in canvas coordinates
+        update = self.panel.GetUpdateClientRect()
+        zoom = self.zoom
+        rect = (update.x / zoom, update.y / zoom,
+                update.width / zoom, update.height / zoom)
+        self.draw_content(gc, rect, zoom)
+        self._draw_tooltip(gc)
 
     def _get_pos(self, view_pos: wx.Point) -> wx.Point:
         """The position on the virtual canvas is the view position added to
@@ -246,56 +510,86 @@ class Canvas(wx.ScrolledWindow):
 
     # ---- Export method ----
     def save_as_png(self, path: str):
-        w, h = self.panel.GetSize()
-        bmp = wx.Bitmap(w, h)
-        mdc = wx.MemoryDC(bmp)
-        mdc.Clear()
-        self.panel.PrepareDC(mdc)
-
-        gc = wx.GraphicsContext.Create(mdc)
-        self.draw_content(gc)
-
-        del gc
-        mdc.SelectObject(wx.NullBitmap)
+        bmp = self._render_offscreen(
+            self._result_labels, self._parameter_labels, self._results_mode,
+            self._dirty_parameter_ids)
         bmp.SaveFile(path, wx.BITMAP_TYPE_PNG)
 
     def update_results(self, values: DataStructure, original: bool):
         mode = self.RESULT_VALID if original else self.RESULT_INVALID
         self.set_results_mode(mode)
-        self._result_labels = self._entries(values, "results")
+        changed = self._update_labels(self._result_labels, values, "label")
+        self._apply_label_changes(changed)
         if original:
-            self._dirty_parameter_ids = set()
-
-        self.Refresh()
+            self._set_dirty_parameters(set())
 
     def update_parameters(self, values: DataStructure):
-        self._parameter_labels = self._entries(values, "parameters")
-        self.Refresh()
-
-    def _entries(self, values: DataStructure, which: str):
-        def e(item):
-            try:
-                q = values.get(item["path"])
-            except KeyError:
-                return None
-            entry = {"label": item["fmt"].format(q.to(item["uom"])),
-                     "id": ".".join(item["path"])}
-            entry.update(item)
-            if "name" not in entry:
-                entry["name"] = entry["id"]
-            return entry
-
-        res = [e(item) for item in self.config[which]]
-        return [r for r in res if r is not None]
-
-    def show_parameter_dialog(self, item: MutableMapping[str, Any],
-                              value: Quantity, units: Set[str]):
-        dialog = ParameterDialog(self, item, value, units)
+        # parameters can be drawn in bold, so their hitbox is sized for that
+        changed = self._update_labels(self._parameter_labels, values, "bold")
+        self._apply_label_changes(changed)
+
+    def _create_labels(self) -> tuple[list[CanvasLabel], list[CanvasLabel]]:
+        return ([CanvasLabel(item) for item in self.config["results"]],
+                [CanvasLabel(item) for item in self.config["parameters"]])
+
+    def _update_labels(self, labels: Sequence[CanvasLabel],
+                       values: DataStructure,
+                       font: str) -> list[tuple[CanvasLabel, wx.Rect]]:
+        """Update the labels by ``values``, and return the labels of which
+        the text changed, together with their previous hitbox. The hitbox is
+        kept if the size of the text did not change."""
+        changed = []
+        for label in labels:
+            old_hitbox = label.hitbox
+            if not label.update(values):
+                continue
+            if label.text is None:
+                label.hitbox = None
+            else:
+                size = self._text_extent(font, label.text)
+                if old_hitbox is None or old_hitbox.GetSize() != size:
+                    label.hitbox = wx.Rect(wx.Point(*label.pos), size)
+            changed.append((label, old_hitbox))
+        return changed
+
+    def _apply_label_changes(self, changed: Sequence[tuple[CanvasLabel,
+                                                            wx.Rect]]):
+        moved = False
+        for label, old_hitbox in changed:
+            self._refresh_label(label)
+            if label.hitbox is not old_hitbox:
+                moved = True
+                if old_hitbox is not None:
+                    self._refresh_rect(old_hitbox)
+        if moved:
+            self._build_label_index()
+
+    def _build_label_index(self):
+        self._label_index.build(
+            (tuple(e.hitbox.Get()), (which, e))
+            for which, labels in (("results", self._result_labels),
+                                  ("parameters", self._parameter_labels))
+            for e in labels if e.hitbox is not None)
+
+    def show_parameter_dialog(self, label: CanvasLabel, value: Quantity,
+                              units: Set[str]):
+        dialog = ParameterDialog(self, label.item, value, units)
         if dialog.ShowModal() == wx.ID_OK:
             self.set_results_mode(self.RESULT_INVALID)
-            self._dirty_parameter_ids.add(item["id"])
+            self._set_dirty_parameters(
+                self._dirty_parameter_ids | {label.id})
             return dialog.value
         return None
 
     def set_results_mode(self, mode: int):
-        self._results_mode = mode
\ No newline at end of file
+        if mode != self._results_mode:  # all results change their colour
+            for e in self._result_labels:
+                self._refresh_label(e)
+        self._results_mode = mode
+
+    def _set_dirty_parameters(self, ids: Set[str]):
+        changed = ids ^ self._dirty_parameter_ids
+        self._dirty_parameter_ids = ids
+        for e in self._parameter_labels:
+            if e.id in changed:
+                self._refresh_label(e)
\ No newline at end of file
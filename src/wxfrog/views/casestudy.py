@@ -10,7 +10,7 @@ from wxfrog.events import (
     CASE_STUDY_PARAMETER_SELECTED, CASE_STUDY_LIST_CHANGED,
     CASE_STUDY_NUMBER_CHANGED, NEW_UNIT_DEFINED, CASE_STUDY_RUN,
     CASE_STUDY_PROGRESS, CASE_STUDY_INTERRUPT, CASE_STUDY_PROPERTIES_SELECTED,
-    CASE_STUDY_ENDED)
+    CASE_STUDY_ENDED, EXPORT_CASE_STUDY, EXPORT_CASE_SNAPSHOTS)
 from .auxiliary import PopupBase
 from .quantity_control import (
     QuantityCtrl, QuantityChangedEvent, EVT_QUANTITY_CHANGED, EVT_UNIT_DEFINED)
@@ -376,7 +376,11 @@ class CaseStudyDialog(wx.Dialog):
                     ("up", wx.ART_GO_UP, False, self._on_up),
                     ("down", wx.ART_GO_DOWN, False, self._on_down),
                     ("del", wx.ART_CROSS_MARK, False, self._on_delete),
-                    ("copy", wx.ART_COPY, False, self._on_copy_results)]
+                    ("copy", wx.ART_COPY, False, self._on_copy_results),
+                    ("export", wx.ART_FILE_SAVE_AS, False,
+                     self._on_export_results),
+                    ("pictures", wx.ART_FILE_SAVE, False,
+                     self._on_export_pictures)]
         self.buttons = {}
         for name, icon, enabled, call_back in btn_data:
             bmp = wx.ArtProvider.GetBitmap(icon , wx.ART_BUTTON, icon_size)
@@ -388,6 +392,7 @@ class CaseStudyDialog(wx.Dialog):
         (run_btn := wx.Button(self, label="Run")).Enable(False)
         run_btn.Bind(wx.EVT_BUTTON, self._on_run)
         self.buttons["run"] = run_btn
+        self.buttons["pictures"].SetToolTip("Export canvas for each case")
 
         for name in "add up down del".split():
             sizer_2.Add(self.buttons[name], 0, wx.EXPAND | wx.ALL, 3)
@@ -396,7 +401,7 @@ class CaseStudyDialog(wx.Dialog):
         pub.subscribe(self._on_total_number_changed, CASE_STUDY_NUMBER_CHANGED)
         sizer_2.Add(self.total_number_label, 1,
                     wx.ALL | wx.ALIGN_CENTER_VERTICAL, 3)
-        for name in "copy run".split():
+        for name in "copy export pictures run".split():
             sizer_2.Add(self.buttons[name], 0, wx.EXPAND | wx.ALL, 3)
         sizer.Add(sizer_2, 0, wx.EXPAND, 0)
         self.SetSizerAndFit(sizer)
@@ -490,6 +495,15 @@ class CaseStudyDialog(wx.Dialog):
             pub.sendMessage(CASE_STUDY_PROPERTIES_SELECTED,
                             paths=picker.selected_paths)
 
+    def _on_export_results(self, event):
+        picker = self._property_picker
+        picker.set_paths(self._scenario.results)
+        if picker.ShowModal() == wx.ID_OK:
+            pub.sendMessage(EXPORT_CASE_STUDY, paths=picker.selected_paths)
+
+    def _on_export_pictures(self, event):
+        pub.sendMessage(EXPORT_CASE_SNAPSHOTS)
+
     def _update_run_button_status(self):
         param_defined = (self.list_ctrl.GetItemCount() > 0)
         self.switch_button_enable("run", self._allow_run and param_defined)
@@ -498,3 +512,5 @@ class CaseStudyDialog(wx.Dialog):
         self._allow_run = enable
         self._update_run_button_status()
         self.switch_button_enable("copy", enable)
+        self.switch_button_enable("export", enable)
+        self.switch_button_enable("pictures", enable)
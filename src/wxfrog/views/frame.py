@@ -1,4 +1,5 @@
 from collections.abc import Collection
+from typing import Optional
 from pubsub.pub import sendMessage
 import wx
 
@@ -6,14 +7,17 @@ from ..config import Configuration, ConfigurationError
 from .canvas import Canvas
 from .config_error_dialog import ConfigErrorDialog
 from .engine_monitor import EngineMonitor
-from .scenario import ScenarioManager
+from .scenario import ScenarioManager, ScenarioLibraryDialog
 from .results import ResultView
 from .casestudy import CaseStudyDialog
 from .about import AboutDialog
 from ..events import (
     EXPORT_CANVAS_GFX, RUN_MODEL, OPEN_SCENARIOS, OPEN_FILE, SAFE_FILE,
-    SAFE_FILE_AS, EXIT_APP, RUN_CASE_STUDY, OPEN_RESULTS, COPY_STREAM_TABLE)
-from ..utils import ThreadedStringIO
+    SAFE_FILE_AS, EXIT_APP, RUN_CASE_STUDY, OPEN_RESULTS, COPY_STREAM_TABLE,
+    OPEN_LIBRARY, EXPORT_STREAM_TABLE)
+from ..utils import (
+    ThreadedStringIO, CLIPBOARD_MARKUP, CLIPBOARD_TEXT, CLIPBOARD_HTML,
+    CLIPBOARD_BOTH)
 
 _FD_STYLE_LOAD = wx.FD_OPEN | wx.FD_FILE_MUST_EXIST
 _FD_STYLE_SAVE = wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT | wx.FD_CHANGE_DIR
@@ -35,10 +39,14 @@ class FrogFrame(wx.Frame):
         self.run_menu_item = None
         self.case_study_menu_item = None
         self.copy_stream_table_menu_item = None
+        self.export_stream_table_menu_item = None
+        self.library_menu_item = None
         self.define_menu()
+        self.CreateStatusBar()
 
         self.monitor = EngineMonitor(self, out_stream)
         self.scenarios = ScenarioManager(self)
+        self.library = ScenarioLibraryDialog(self)
         self.results = ResultView(self)
         self.case_studies = CaseStudyDialog(self)
         about_text = config.get("about", f"<h3>{config['app_name']}</h3>")
@@ -82,6 +90,11 @@ class FrogFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self._on_copy_stream_table, item)
         item.Enable(False)
         self.copy_stream_table_menu_item = item
+        item = file_menu.Append(wx.ID_ANY, "Export stream &table ...",
+                                "Export stream table into csv or tsv file")
+        self.Bind(wx.EVT_MENU, self._on_export_stream_table, item)
+        item.Enable(False)
+        self.export_stream_table_menu_item = item
         item = file_menu.Append(wx.ID_ANY, "E&xit\tCTRL+X", "Exit simulator")
         self.Bind(wx.EVT_MENU, lambda e: self.Close(), item)
         menu_bar.Append(file_menu, "&File")
@@ -106,9 +119,24 @@ class FrogFrame(wx.Frame):
         item = view_menu.Append(wx.ID_ANY, "&Scenarios\tCTRL+M",
                                  "Manage Scenarios")
         self.Bind(wx.EVT_MENU, lambda e: sendMessage(OPEN_SCENARIOS), item)
+        item = view_menu.Append(wx.ID_ANY, "Scenario &library\tCTRL+L",
+                                "Browse scenario library")
+        self.Bind(wx.EVT_MENU, lambda e: sendMessage(OPEN_LIBRARY), item)
+        item.Enable(False)
+        self.library_menu_item = item
         item = view_menu.Append(wx.ID_ANY, "&All Results\tCTRL+A",
                                  "Show results")
         self.Bind(wx.EVT_MENU, lambda e: sendMessage(OPEN_RESULTS), item)
+        view_menu.AppendSeparator()
+        item = view_menu.Append(wx.ID_ANY, "Zoom &in\tCTRL++",
+                                "Enlarge the flowsheet")
+        self.Bind(wx.EVT_MENU, lambda e: self.canvas.zoom_in(), item)
+        item = view_menu.Append(wx.ID_ANY, "Zoom &out\tCTRL+-",
+                                "Shrink the flowsheet")
+        self.Bind(wx.EVT_MENU, lambda e: self.canvas.zoom_out(), item)
+        item = view_menu.Append(wx.ID_ANY, "Actual si&ze\tCTRL+0",
+                                "Show the flowsheet in original size")
+        self.Bind(wx.EVT_MENU, lambda e: self.canvas.set_zoom(1), item)
         menu_bar.Append(view_menu, "&View")
 
         help_menu = wx.Menu()
@@ -121,7 +149,6 @@ class FrogFrame(wx.Frame):
 
     def show_calculation_error(self, error: str):
         self.canvas.set_results_mode(Canvas.RESULT_ERROR)
-        self.Refresh()
         msg = f"{error}\n\nDo you want to open the engine monitor?"
         style = wx.YES_NO | wx.ICON_ERROR
         title = "Engine calculation error"
@@ -144,10 +171,56 @@ class FrogFrame(wx.Frame):
         else:
             return None
 
+    def show_export_dialog(self, msg: str) -> Optional[str]:
+        wildcard = "CSV files (*.csv)|*.csv|TSV files (*.tsv)|*.tsv"
+        dialog = wx.FileDialog(self, msg, wildcard=wildcard,
+                               style=_FD_STYLE_SAVE)
+        if dialog.ShowModal() != wx.ID_OK:
+            return None
+        path = dialog.GetPath()
+        ending = ("csv", "tsv")[dialog.GetFilterIndex()]
+        if path.lower().endswith((".csv", ".tsv")):
+            return path
+        return f"{path}.{ending}"
+
+    def ask_clipboard_format(self) -> Optional[str]:
+        choices = {"HTML markup as text (for Excel)": CLIPBOARD_MARKUP,
+                   "Text (compact, tab separated)": CLIPBOARD_TEXT,
+                   "HTML (formatted)": CLIPBOARD_HTML,
+                   "Both": CLIPBOARD_BOTH}
+        dialog = wx.SingleChoiceDialog(self, "Copy table to clipboard as",
+                                       "Copy table", list(choices))
+        if dialog.ShowModal() != wx.ID_OK:
+            return None
+        return choices[dialog.GetStringSelection()]
+
+    def show_export_error(self, error: str):
+        dialog = wx.MessageDialog(self, error, "Export",
+                                  style=wx.OK | wx.ICON_ERROR)
+        dialog.ShowModal()
+
     def update_title(self, filename: str):
         title = f"{self.config['app_name']} - {filename}"
         self.SetTitle(title)
 
+    def set_status(self, text: str):
+        self.SetStatusText(text)
+
+    def ask_recovery(self, num_changes: int) -> bool:
+        msg = (f"There are {num_changes} unsaved changes from a previous "
+               "session that did not end properly.\n\n"
+               "Do you want to recover them?")
+        dialog = wx.MessageDialog(self, msg, "Recover changes",
+                                  style=wx.YES_NO | wx.ICON_QUESTION)
+        return dialog.ShowModal() == wx.ID_YES
+
+    def show_save_error(self, path: str, error: str):
+        self.set_status("")
+        msg = f"Failed to save {path}:\n\n{error}"
+        dialog = wx.MessageDialog(self, msg, "Save file",
+                                  style=wx.OK | wx.ICON_ERROR)
+        dialog.ShowModal()
+
     def show_config_error_dialog(self, errors: Collection[ConfigurationError]):
         dialog = ConfigErrorDialog(self, errors)
         dialog.ShowModal()
@@ -159,14 +232,22 @@ class FrogFrame(wx.Frame):
         cs.Show()
 
     def _on_copy_stream_table(self, event):
+        if (name := self._select_stream_table()) is not None:
+            sendMessage(COPY_STREAM_TABLE, name=name)
+
+    def _on_export_stream_table(self, event):
+        if (name := self._select_stream_table()) is not None:
+            sendMessage(EXPORT_STREAM_TABLE, name=name)
+
+    def _select_stream_table(self) -> Optional[str]:
         table_def = self.config.get("tables", {})
         match len(table_def):
             case 0:
                 wx.MessageBox("No stream table defined", "Export stream table",
                               wx.ICON_WARNING | wx.CANCEL)
             case 1:
-                first = next(iter(table_def))
-                sendMessage(COPY_STREAM_TABLE, name=first)
+                return next(iter(table_def))
             case _:
                 # TODO: simple list dialog (Combobox) to select a table to copy.
                 print("Multiple stream tables are not yet supported")
+        return None
@@ -1,7 +1,13 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from math import ceil, floor
+
 import wx
 from wx.svg import SVGimage
 
+TILE_SIZE = 512  # pixels
+TILE_CACHE_SIZE = 64  # tiles, about 64 MB
+
 
 class ImageWrap(ABC):
     @property
@@ -18,6 +24,23 @@ class ImageWrap(ABC):
     def render_to_gc(self, gc, size):
         ...
 
+    def render_region(self, region: wx.Rect, size: wx.Size,
+                      background: wx.Colour) -> wx.Bitmap:
+        """Return the part ``region`` of the image scaled to ``size`` as
+        bitmap, drawn over the ``background`` colour"""
+        bmp = wx.Bitmap(region.width, region.height)
+        mdc = wx.MemoryDC(bmp)
+        mdc.SetBackground(wx.Brush(background))
+        mdc.Clear()
+        gc = wx.GraphicsContext.Create(mdc)
+        # only rasterise what falls into the region
+        gc.Clip(0, 0, region.width, region.height)
+        gc.Translate(-region.x, -region.y)
+        self.render_to_gc(gc, size)
+        del gc
+        mdc.SelectObject(wx.NullBitmap)
+        return bmp
+
 class SVGImageWrap(ImageWrap):
     def __init__(self, file):
         image_data = bytes(file.read())
@@ -36,17 +59,112 @@ class SVGImageWrap(ImageWrap):
 
 class PNGImageWrap(ImageWrap):
     def __init__(self, file):
-        image = wx.Image(file, wx.BITMAP_TYPE_PNG)
-        self.bitmap = wx.Bitmap(image)
+        self.image = wx.Image(file, wx.BITMAP_TYPE_PNG)
+        self._bitmap = None  # only created if drawn as a whole
 
     @property
     def height(self):
-        return self.bitmap.GetHeight()
+        return self.image.GetHeight()
 
     @property
     def width(self):
-        return self.bitmap.GetWidth()
+        return self.image.GetWidth()
 
     def render_to_gc(self, gc, size: wx.Size):
+        if self._bitmap is None:
+            self._bitmap = wx.Bitmap(self.image)
         w, h = size.GetWidth(), size.GetHeight()
-        gc.DrawBitmap(self.bitmap, 0, 0, w, h)
\ No newline at end of file
+        gc.DrawBitmap(self._bitmap, 0, 0, w, h)
+
+    def render_region(self, region: wx.Rect, size: wx.Size,
+                      background: wx.Colour) -> wx.Bitmap:
+        # scale only the needed part of the image, not the entire image
+        sx, sy = self.width / size.width, self.height / size.height
+        x, y = floor(region.x * sx), floor(region.y * sy)
+        src = wx.Rect(x, y,
+                      min(self.width, ceil(region.Right * sx) + 1) - x,
+                      min(self.height, ceil(region.Bottom * sy) + 1) - y)
+        part = self.image.GetSubImage(src)
+        # pixels of the part beyond the region, due to rounding
+        w = round(src.width / sx)
+        h = round(src.height / sy)
+        part = part.Scale(max(1, w), max(1, h), wx.IMAGE_QUALITY_HIGH)
+        bmp = wx.Bitmap(region.width, region.height)
+        mdc = wx.MemoryDC(bmp)
+        mdc.SetBackground(wx.Brush(background))
+        mdc.Clear()
+        mdc.DrawBitmap(wx.Bitmap(part), round(x / sx) - region.x,
+                       round(y / sy) - region.y, True)
+        mdc.SelectObject(wx.NullBitmap)
+        return bmp
+
+
+class TiledImageWrap(ImageWrap):
+    """Draws another image in square tiles, such that huge images are
+    rendered only where they are visible.
+
+    Tiles are rendered on demand for each scale, being the number of pixels
+    per unit of the target size, and are drawn over the ``background``
+    colour. The most recently used tiles are kept in a cache of limited
+    size.
+    """
+    def __init__(self, image: ImageWrap, background: wx.Colour,
+                 tile_size: int = TILE_SIZE,
+                 cache_size: int = TILE_CACHE_SIZE):
+        self.image = image
+        self.background = background
+        self.tile_size = tile_size
+        self.cache_size = cache_size
+        self._tiles: OrderedDict[tuple, wx.Bitmap] = OrderedDict()
+
+    @property
+    def height(self):
+        return self.image.height
+
+    @property
+    def width(self):
+        return self.image.width
+
+    def clear(self):
+        """Discard all cached tiles"""
+        self._tiles.clear()
+
+    def render_to_gc(self, gc, size: wx.Size,
+                     rect: tuple[float, float, float, float] = None,
+                     scale: float = 1.0):
+        """Draw the image in given size, but only the tiles overlapping
+        ``rect``, given in the same units as ``size``. The tiles are rendered
+        with ``scale`` pixels per unit."""
+        w, h = size.Get()
+        pixels = wx.Size(max(1, round(w * scale)), max(1, round(h * scale)))
+        if rect is None:
+            rect = (0, 0, w, h)
+        x, y, rw, rh = rect
+        tile = self.tile_size
+        t = tile / scale  # tile size in units of size
+        cols = range(max(0, floor(x / t)),
+                      min(ceil(pixels.width / tile), ceil((x + rw) / t)))
+        rows = range(max(0, floor(y / t)),
+                      min(ceil(pixels.height / tile), ceil((y + rh) / t)))
+        for i in cols:
+            for j in rows:
+                bmp = self._tile(pixels, i, j)
+                gc.DrawBitmap(bmp, i * t, j * t, bmp.GetWidth() / scale,
+                              bmp.GetHeight() / scale)
+
+    def _tile(self, pixels: wx.Size, i: int, j: int) -> wx.Bitmap:
+        key = (pixels.Get(), i, j)
+        try:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+        except KeyError:
+            pass
+        tile = self.tile_size
+        x, y = i * tile, j * tile
+        region = wx.Rect(x, y, min(tile, pixels.width - x),
+                         min(tile, pixels.height - y))
+        bmp = self.image.render_region(region, pixels, self.background)
+        self._tiles[key] = bmp
+        if len(self._tiles) > self.cache_size:
+            self._tiles.popitem(last=False)
+        return bmp
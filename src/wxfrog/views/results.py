@@ -1,103 +1,163 @@
-from collections.abc import Mapping
-from typing import Any
+from collections.abc import Callable
+from threading import Thread
+from typing import Optional
 
 import wx
 from wx.dataview import (
-    PyDataViewModel, DataViewItem, NullDataViewItem, DataViewCtrl,
+    PyDataViewModel, DataViewItem, DataViewItemArray, NullDataViewItem,
+    DataViewCtrl,
     DV_HORIZ_RULES, DV_ROW_LINES, DV_VERT_RULES, DV_MULTIPLE,
     EVT_DATAVIEW_ITEM_ACTIVATED, EVT_DATAVIEW_ITEM_CONTEXT_MENU,
     EVT_DATAVIEW_ITEM_COLLAPSED, EVT_DATAVIEW_ITEM_EXPANDED)
 from pubsub import pub
 from pint.registry import Quantity
 
-from ..utils import fmt_unit, PathFilter, DataStructure
+from ..utils import (
+    fmt_unit, format_unit, PathFilter, DataStructure)
 from ..events import RESULT_UNIT_CLICKED, NEW_UNIT_DEFINED, RESULT_UNIT_CHANGED
+from ..models.resulttree import ResultTree, ResultNode
 from .auxiliary import PopupBase
 
+SEARCH_DELAY = 300  # ms after the last key stroke
+
 
 class ResultViewModel(PyDataViewModel):
+    """Model of the result view, backed by a :class:`ResultTree`. The items
+    are the tree nodes, such that item ids are stable across calculations,
+    and only the leaves that changed are refreshed.
+
+    Changes are notified in one batch, and only for leaves with all their
+    ancestors in ``expanded``, as the view asks for values of other items
+    anyway once they are shown. The cost of an update is thereby bounded
+    by the number of visible rows."""
     def __init__(self):
         super().__init__()
+        self.UseWeakRefs(True)  # nodes dropped by the tree are released
         self.data = DataStructure()
-        self._filtered_data = self.data
+        self.tree = ResultTree()
         self._filter_term = ""
-        self._items = {}
+        # term and filtered data of the last applied search, to narrow down
+        self._matches: Optional[tuple[str, Optional[dict]]] = None
+        self._search_count = 0  # to recognise stale search results
+        self._searching = None  # term and callback of the running search
+        self.expanded: set[int] = set()  # path ids, maintained by the view
 
     def set_data(self, data: DataStructure):
         self.data = data
+        self._matches = None
+        self._search_count += 1  # running searches refer to old data
+        self._searching = None
         self.apply_filter(self._filter_term)
-        self._items = {}
-        self.Cleared()
 
-    def ObjectToItem(self, path):
-        # required so that same items have same ids
-        if path not in self._items:
-            item = super().ObjectToItem(path)
-            self._items[path] = item
-        return self._items[path]
+    def node(self, item: DataViewItem) -> ResultNode:
+        return self.ItemToObject(item) if item else self.tree.root
 
     def IsContainer(self, item: DataViewItem) -> bool:
-        if not item:
-            return True
-        path = self.ItemToObject(item)
-        return isinstance(self._filtered_data.get(path), Mapping)
+        return not self.node(item).is_leaf
 
     def GetParent(self, item: DataViewItem) -> DataViewItem:
         if not item:
             return NullDataViewItem
-        path = self.ItemToObject(item)
-        if len(path) == 1:
+        parent = self.ItemToObject(item).parent
+        if parent is self.tree.root:
             return NullDataViewItem
-        result = self.ObjectToItem(path[:-1])
-        return result
+        return self.ObjectToItem(parent)
 
     def HasValue(self, item: DataViewItem, col: int):
-        path = self.ItemToObject(item)
-        return col == 0 or not self.IsContainer(item)
+        return col == 0 or self.node(item).is_leaf
 
     def GetChildren(self, item: DataViewItem,
                     children: list[DataViewItem]) -> int:
-        path = self.ItemToObject(item) if item else ()
-        if isinstance(data := self._filtered_data.get(path), Mapping):
-            for k in data:
-                children.append(self.ObjectToItem(path + (k, )))
+        node = self.node(item)
+        if not node.is_leaf:
+            children.extend(map(self.ObjectToItem, node.children))
         return len(children)
 
     def GetValue(self, item: DataViewItem, col: int) -> str:
-        path = self.ItemToObject(item)
+        node = self.ItemToObject(item)
         if col == 0:
-            return path[-1]
-        value = self._filtered_data.get(path)
-        if isinstance(value, Mapping):
+            return node.name
+        if (value := node.value) is None:
             return ""
-        return f"{value.m:.6g}" if col == 1 else f"{value.u:~P}"
+        return f"{value.m:.6g}" if col == 1 else format_unit(value.u, "~P")
+
+    def set_value(self, item: DataViewItem, value: Quantity):
+        node = self.ItemToObject(item)
+        self.data.set(node.path, value)
+        node.value = value
+        self._values_changed()
+        self.ItemChanged(item)
 
     def all_values_changed(self):
-        def dive(item: DataViewItem):
-            if self.IsContainer(item):
-                self.GetChildren(item, children := [])
-                for c in children:
-                    dive(c)
-            else:
-                self.ValueChanged(item, 1)
-                self.ValueChanged(item, 2)
-        dive(NullDataViewItem)
+        self._values_changed()
+        self._notify_changed(self.tree.refresh(self.data))
 
     def apply_filter(self, term: str):
-        def dive(d: DataStructure, path: tuple[str, ...]):
-            if isinstance(d, Mapping):
-                result = {k: dive(v, path + (k, )) for k, v in d.items()}
-                result =  {k: v for k, v in result.items() if v is not None}
-                return result if result else None
-            else:
-                return d if filter_.matches(path) else None
-
-        self._items = {}
         self._filter_term = term
-        filter_ = PathFilter(term)
-        data = dive(self.data, ())
-        self._filtered_data = DataStructure({} if data is None else data)
-        self.Cleared()
+        self.show_matches(term, PathFilter(term).apply(self.data))
+
+    def search(self, term: str,
+               callback: Callable[[str, Optional[dict]], None]):
+        """Filter the data by ``term`` in a background thread. If the search
+        is still the latest one when finished, ``callback`` is called with
+        the term and the filtered data in the GUI thread, normally to pass
+        them on to :meth:`show_matches`. If ``term`` narrows down the last
+        applied search, only the previous matches are filtered."""
+        self._filter_term = term
+        self._searching = term, callback
+        self._search_count += 1
+        count = self._search_count
+        source = self.data
+        if self._matches is not None:
+            previous, matches = self._matches
+            if PathFilter(term).narrows(PathFilter(previous)):
+                source = matches
+
+        def f():
+            data = None if source is None else PathFilter(term).apply(source)
+            wx.CallAfter(done, data)
+
+        def done(data):
+            if count == self._search_count:
+                self._searching = None
+                callback(term, data)
+
+        Thread(target=f, daemon=True).start()
+
+    def _values_changed(self):
+        # previous matches hold old values, and a running search might have
+        # read some of them, so it is started over
+        self._matches = None
+        if self._searching is not None:
+            self.search(*self._searching)
+
+    def show_matches(self, term: str, data: Optional[dict]):
+        """Show the result of filtering the data by ``term``"""
+        self._matches = (term, data)
+        changed = self.tree.update({} if data is None else data)
+        if changed is None:
+            self.Cleared()
+        else:
+            self._notify_changed(changed)
+
+    def _notify_changed(self, nodes: list[ResultNode]):
+        root, expanded = self.tree.root, self.expanded
+        shown = {root: True}  # by parent, as siblings come in sequence
+
+        def is_shown(node: ResultNode) -> bool:
+            try:
+                return shown[node]
+            except KeyError:
+                result = node.id in expanded and is_shown(node.parent)
+                shown[node] = result
+                return result
+
+        items = DataViewItemArray()
+        for node in nodes:
+            if is_shown(node.parent):
+                items.append(self.ObjectToItem(node))
+        if items:
+            self.ItemsChanged(items)
 
 
 class UnitPopup(PopupBase):
@@ -136,7 +196,6 @@ class ResultDataViewCtrl(DataViewCtrl):
         self.AppendTextColumn("Unit", 2, width=100)
         self._popup_ids = None
         self._mouse_event = None
-        self._expanded = set() # store all items (or ids) that are expanded
         # whether to react to collapsed and expanded events right now
         self._record_expanded = True
         self._get_expanded()
@@ -169,8 +228,7 @@ class ResultDataViewCtrl(DataViewCtrl):
         item = ev.GetItem()
         col = ev.GetColumn()
         model = self.model
-        path = model.ItemToObject(item)
-        value = model.data.get(path)
+        value = model.ItemToObject(item).value
         if isinstance(value, Quantity):
             model.data.convert_all_possible_to(value.u)
         model.all_values_changed()
@@ -182,7 +240,7 @@ class ResultDataViewCtrl(DataViewCtrl):
                     self.IsExpanded(item) or not item):
                 return
             if item:
-                expanded.add(model.ItemToObject(item))
+                expanded.add(model.ItemToObject(item).id)
             model.GetChildren(item, children := [])
             for c in children:
                 dive(c)
@@ -192,7 +250,7 @@ class ResultDataViewCtrl(DataViewCtrl):
         expanded = set()
         model = self.model
         dive(NullDataViewItem)
-        self._expanded = expanded
+        model.expanded = expanded
 
     def _apply_expanded(self):
         def dive(item: DataViewItem):
@@ -200,10 +258,10 @@ class ResultDataViewCtrl(DataViewCtrl):
                 return
             expand = True
             if item:
-                path = model.ItemToObject(item)
-                expand = path in self._expanded
+                id_ = model.ItemToObject(item).id
+                expand = id_ in model.expanded
                 if expand:
-                    expanded.add(path)
+                    expanded.add(id_)
             if not expand:
                 return
             self.Expand(item)
@@ -214,7 +272,7 @@ class ResultDataViewCtrl(DataViewCtrl):
         expanded = set()
         model = self.model
         dive(NullDataViewItem)
-        self._expanded = expanded
+        model.expanded = expanded
 
     def on_collapse_all(self, event):
         def collapse(item):
@@ -235,31 +293,28 @@ class ResultDataViewCtrl(DataViewCtrl):
         if event.GetColumn() != 2:
             return
         item = event.GetItem()
-        path = self.model.ItemToObject(item)
-        q = self.model.data.get(path)
+        q = self.model.ItemToObject(item).value
         if isinstance(q, Quantity):
             pub.sendMessage(RESULT_UNIT_CLICKED, item=item, value=q)
 
     def change_unit(self, item, units):
         def commit(new_unit):
             try:
-                self.model.data.set(path, value.to(new_unit))
-                # should fire event to refresh results on canvas
+                new_value = value.to(new_unit)
             except Exception as e:  # this can be a lot of different ones
                 msg = f"Invalid unit: {e}"
                 style = wx.ICON_ERROR| wx.OK
                 title = "Unit of measurement error"
                 wx.MessageDialog(self, msg, title, style=style).ShowModal()
                 return False
-            self.model.ItemChanged(item)
+            self.model.set_value(item, new_value)
             if new_unit not in units:
                 pub.sendMessage(NEW_UNIT_DEFINED, unit=new_unit)
             pub.sendMessage(RESULT_UNIT_CHANGED)
             return True
 
         col = self.GetColumn(2)
-        path = self.model.ItemToObject(item)
-        value = self.model.data.get(path)
+        value = self.model.ItemToObject(item).value
         units = list(units | {active_unit := fmt_unit(value.u)})
 
         # position and size
@@ -277,8 +332,11 @@ class ResultDataViewCtrl(DataViewCtrl):
         self._record_expanded = True
 
     def on_search(self, term: str):
+        self.model.search(term, self._show_matches)
+
+    def _show_matches(self, term: str, data: Optional[dict]):
         self._record_expanded = False
-        self.model.apply_filter(term)
+        self.model.show_matches(term, data)
         self._apply_expanded()
         self._record_expanded = True
 
@@ -309,9 +367,24 @@ class ResultView(wx.Frame):
 
         self.SetMenuBar(menu_bar)
         self.Bind(wx.EVT_CLOSE, lambda e: self.Show(False))
-        # for e in (wx.EVT_SEARCH, wx.EVT_SEARCH_CANCEL,
-        #           wx.EVT_KILL_FOCUS, wx.EVT_TEXT_ENTER):
+        # search as you type, but only once typing pauses
+        self._search_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self._on_search, self._search_timer)
+        self.search.Bind(wx.EVT_TEXT, self._on_text)
         self.search.Bind(wx.EVT_SEARCH, self._on_search)
+        self.search.Bind(wx.EVT_SEARCH_CANCEL, self._on_search_cancel)
+        self._term = ""
+
+    def _on_text(self, event):
+        self._search_timer.StartOnce(SEARCH_DELAY)
+
+    def _on_search_cancel(self, event):
+        self.search.ChangeValue("")
+        self._on_search(event)
 
     def _on_search(self, event):
-        self.view_ctrl.on_search(self.search.GetValue())
+        self._search_timer.Stop()
+        term = self.search.GetValue()
+        if term != self._term:
+            self._term = term
+            self.view_ctrl.on_search(term)
@@ -1,5 +1,5 @@
-from collections.abc import Mapping, Collection
-from typing import Tuple
+from collections.abc import Mapping, Collection, Sequence
+from typing import Tuple, Optional
 from datetime import datetime
 
 from pubsub import pub
@@ -8,7 +8,10 @@ from wx.lib.mixins import listctrl
 from wxfrog.models.scenarios import (
     SCENARIO_CURRENT, SCENARIO_CONVERGED, SCENARIO_DEFAULT)
 from .colors import ERROR_RED, WARNING_ORANGE
-from ..events import COPY_SCENARIO, RENAME_SCENARIO, DELETE_SCENARIO
+from wxfrog.models.library import LibraryEntry
+from ..events import (
+    COPY_SCENARIO, RENAME_SCENARIO, DELETE_SCENARIO, STORE_IN_LIBRARY,
+    FETCH_FROM_LIBRARY)
 
 class ScenarioNameDialog(wx.Dialog):
     def __init__(self, parent: wx.Window, names: Collection[str]):
@@ -93,6 +96,8 @@ class ScenarioManager(wx.Dialog):
 
         self._popup_ids = None
         self._scenario_in_context = None
+        # names in scenario library, None if there is no library
+        self.library_names: Optional[Collection[str]] = None
 
     def update(self, scenarios: Mapping[str, Tuple[bool, datetime]]):
         lst = self.list
@@ -109,7 +114,10 @@ class ScenarioManager(wx.Dialog):
             "Rename": (self._on_rename, ("custom",)),
             "Delete": (self._on_delete, ("custom",)),
             "Activate": (self._on_activate,
-                         ("custom", SCENARIO_CONVERGED, SCENARIO_DEFAULT))}
+                         ("custom", SCENARIO_CONVERGED, SCENARIO_DEFAULT)),
+            "Store in library": (self._on_store_in_library,
+                                 ("custom", SCENARIO_CONVERGED,
+                                  SCENARIO_CURRENT, SCENARIO_DEFAULT))}
 
         if self._popup_ids is None:
             ids = {}
@@ -123,6 +131,8 @@ class ScenarioManager(wx.Dialog):
             return
         menu = wx.Menu()
         for n, ref_id in self._popup_ids.items():
+            if n == "Store in library" and self.library_names is None:
+                continue
             if (name if name[0] == "*" else "custom") in menu_items[n][1]:
                 menu.Append(ref_id, n)
 
@@ -157,10 +167,70 @@ class ScenarioManager(wx.Dialog):
         source = self._scenario_in_context
         pub.sendMessage(COPY_SCENARIO, source=source, target=SCENARIO_CURRENT)
 
+    def _on_store_in_library(self, event):
+        source = self._scenario_in_context
+        dialog = ScenarioNameDialog(self, self.library_names)
+        if not source.startswith("*"):
+            dialog.name_ctrl.SetValue(source)
+        if dialog.ShowModal() == wx.ID_OK:
+            pub.sendMessage(STORE_IN_LIBRARY, source=source,
+                            target=dialog.value)
+
     def _get_custom_names(self) -> Collection[str]:
         lst, idx, names = self.list, -1, set()
         while (idx := lst.GetNextItem(idx)) > -1:
             name = lst.GetItemText(idx)
             if not name.startswith("*"):
                 names.add(name)
-        return names
\ No newline at end of file
+        return names
+
+class LibraryListCtrl(wx.ListCtrl, listctrl.ListCtrlAutoWidthMixin):
+    # virtual, as the library can contain thousands of scenarios
+    def __init__(self, parent: wx.Window):
+        style = wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL
+        super().__init__(parent, style=style)
+        listctrl.ListCtrlAutoWidthMixin.__init__(self)  # wx doesn't use super()
+        self.SetMinSize(wx.Size(500, 300))
+        self.InsertColumn(0, "Scenario", width=290)
+        self.InsertColumn(1, "Modified", width=140)
+        self.InsertColumn(2, "Results")
+        self.entries: Sequence[LibraryEntry] = []
+
+    def set_entries(self, entries: Sequence[LibraryEntry]):
+        self.entries = entries
+        self.SetItemCount(len(entries))
+        self.Refresh()
+
+    def OnGetItemText(self, item, column):
+        entry = self.entries[item]
+        if column == 0:
+            return entry.name
+        elif column == 1:
+            return entry.mod_local_time().strftime("%y-%m-%d %H:%M:%S")
+        return "Yes" if entry.has_results else "No"
+
+
+class ScenarioLibraryDialog(wx.Dialog):
+    """Browse the scenario library, and fetch scenarios by activating them"""
+    def __init__(self, parent: wx.Window):
+        super().__init__(parent, title="Scenario library")
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        self.list = LibraryListCtrl(self)
+        sizer.Add(self.list, 1, wx.EXPAND | wx.ALL, 3)
+        self.SetSizerAndFit(sizer)
+        self.list.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self._on_activated)
+        self._names: Collection[str] = set()
+
+    def update(self, entries: Sequence[LibraryEntry], names: Collection[str]):
+        """Show library ``entries``, while ``names`` are the names of the
+        custom scenarios in the project."""
+        self.list.set_entries(entries)
+        self._names = names
+
+    def _on_activated(self, event):
+        source = self.list.entries[event.GetIndex()].name
+        dialog = ScenarioNameDialog(self, self._names)
+        dialog.name_ctrl.SetValue(source)
+        if dialog.ShowModal() == wx.ID_OK:
+            pub.sendMessage(FETCH_FROM_LIBRARY, source=source,
+                            target=dialog.value)
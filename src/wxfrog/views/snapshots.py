@@ -0,0 +1,93 @@
+from collections.abc import Iterable
+from os.path import splitext
+from queue import Queue
+from threading import Thread, Lock
+
+import wx
+from pubsub import pub
+
+from ..events import EXPORT_PROGRESS, EXPORT_ENDED
+from ..utils import DataStructure
+from .canvas import Canvas
+
+PIPELINE_DEPTH = 8  # rendered pictures waiting to be written
+RENDER_BATCH = 4  # pictures rendered before returning to the event loop
+
+
+class SnapshotExport:
+    """Export a picture of the canvas for each case of a case study.
+
+    The canvas is rendered off-screen in the GUI thread, a few pictures at a
+    time, such that the application stays responsive. The background is
+    rendered only once, and the labels of each case drawn onto a copy. Encoding and writing
+    the png files is done by a worker thread meanwhile. Like
+    :class:`~wxfrog.models.export.TableExport`, progress is published via
+    ``EXPORT_PROGRESS``, and ``EXPORT_ENDED`` is sent at the end.
+
+    The files are named after ``path``, extended by the case number.
+    """
+    def __init__(self, canvas: Canvas, path: str,
+                 cases: Iterable[tuple[DataStructure, DataStructure]],
+                 num_rows: int):
+        self.path = path
+        self.num_rows = num_rows
+        self._canvas = canvas
+        self._cases = iter(cases)
+        self._queue = Queue(PIPELINE_DEPTH)
+        self._lock = Lock()
+        self._interrupt = False
+        self._count = 0
+        self._background = None  # rendered in GUI thread once needed
+
+    def file_name(self, k: int) -> str:
+        """Return the file name of the ``k``-th case, counting from zero"""
+        stem, ending = splitext(self.path)
+        digits = len(str(self.num_rows))
+        return f"{stem}_{k + 1:0{digits}d}{ending}"
+
+    def run(self):
+        Thread(target=self._write, daemon=True).start()
+        wx.CallAfter(self._render)
+
+    def interrupt(self):
+        with self._lock:
+            self._interrupt = True
+
+    def _interrupted(self):
+        with self._lock:
+            return self._interrupt
+
+    def _render(self):
+        # called in GUI thread, being the only producer of the queue
+        for _ in range(RENDER_BATCH):
+            if self._interrupted():
+                self._queue.put(None)
+                return
+            if self._queue.full():  # writer is behind, wait for it
+                wx.CallLater(20, self._render)
+                return
+            try:
+                params, results = next(self._cases)
+            except StopIteration:
+                self._queue.put(None)
+                return
+            if self._background is None:
+                self._background = self._canvas.render_background()
+            image = self._canvas.render_snapshot(params, results,
+                                                 self._background)
+            self._queue.put((self.file_name(self._count), image))
+            self._count += 1
+        wx.CallAfter(self._render)
+
+    def _write(self):
+        k, message = 0, None
+        while (job := self._queue.get()) is not None:
+            if message is not None or self._interrupted():
+                continue  # consume the queue, so rendering doesn't block
+            path, image = job
+            if not image.SaveFile(path, wx.BITMAP_TYPE_PNG):
+                message = f"Failed to write {path}"
+                continue
+            k += 1
+            pub.sendMessage(EXPORT_PROGRESS, k=k)
+        pub.sendMessage(EXPORT_ENDED, message=message)
@@ -1,5 +1,7 @@
-from wxfrog.models.casestudy import ParameterSpec
-from wxfrog.utils import get_unit_registry
+from math import nan
+
+from wxfrog.models.casestudy import ParameterSpec, CaseStudyResults
+from wxfrog.utils import get_unit_registry, DataStructure
 
 
 def test_parameter_spec_linear_incr():
@@ -31,3 +33,35 @@ def test_parameter_spec_log_incr():
                          incr=q(10), log=True)
     assert spec.num == 6
     assert spec.data[-2] == q(10, "m")
+
+
+def test_results_serialize_roundtrip(sample_structure):
+    q = get_unit_registry().Quantity
+    params = DataStructure({"x": q(3, "m")})
+    results = CaseStudyResults([("x",)], sample_structure.all_paths)
+    results.add_result(params, sample_structure)
+    params.set(("x",), q(400, "cm"))
+    results.add_result(params, sample_structure)
+
+    data = memoryview(results.data())
+    loaded = CaseStudyResults.from_buffer(results.schema(), data)
+    assert loaded.num_rows == 2
+    assert loaded.param_units == ["meter"]
+    assert list(loaded.params[0]) == [3.0, 4.0]
+    assert loaded.result_columns == results.result_columns
+    assert list(loaded.results[-1]) == list(results.results[-1])
+
+
+def test_results_cases(sample_structure):
+    q = get_unit_registry().Quantity
+    params = DataStructure({"x": q(3, "m"), "y": q(1, "s")})
+    results = CaseStudyResults([("x",)], [("Pump", "power")])
+    for x in (3, 4):
+        params.set(("x",), q(x, "m"))
+        results.add_result(params, sample_structure)
+    results.results[0][1] = nan  # result missing in first case
+    cases = [(p.get(("x",)), p.get(("y",)), r.get(("Pump",)).copy())
+             for p, r in results.cases(params)]
+    assert [c[0] for c in cases] == [q(3, "m"), q(4, "m")]
+    assert cases[0][1] == q(1, "s")
+    assert "power" in cases[0][2] and "power" not in cases[1][2]
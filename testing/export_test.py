@@ -0,0 +1,41 @@
+from csv import reader
+
+from pubsub import pub
+
+from wxfrog.models.casestudy import CaseStudyResults
+from wxfrog.events import EXPORT_ENDED
+from wxfrog.models.export import separator, number_formatter, TableExport
+from wxfrog.utils import DataStructure, get_unit_registry
+
+Q = get_unit_registry().Quantity
+
+
+def test_case_study_export(tmp_path, sample_structure):
+    path = str(tmp_path / "results.tsv")
+    results = CaseStudyResults([("x",)], sample_structure.all_paths)
+    for x in range(3):
+        results.add_result(DataStructure({"x": Q(x, "m")}), sample_structure)
+    results.export(path, [["Pump"]]).write()
+
+    fmt = number_formatter()
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        rows = list(reader(file, delimiter=separator(path)))
+    assert rows[0] == ["Case", "x", "Pump.power", "Pump.efficiency"]
+    assert rows[1] == ["", "m", "MW", "%"]
+    assert rows[4] == ["3", fmt(2.0), fmt(2.0), fmt(87.0)]
+    assert len(rows) == 5
+
+
+def test_export_failure(tmp_path):
+    messages = []
+
+    def on_ended(message):
+        messages.append(message)
+
+    pub.subscribe(on_ended, EXPORT_ENDED)
+    try:
+        path = str(tmp_path / "table.tsv")
+        TableExport(path, [["x"]], [[1.0], ["oops"]], 2)._run()
+    finally:
+        pub.unsubscribe(on_ended, EXPORT_ENDED)
+    assert len(messages) == 1 and messages[0].startswith("TypeError")
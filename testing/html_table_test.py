@@ -3,6 +3,7 @@ from wxfrog.models.html import HtmlTable
 
 from random import random, seed
 from math import nan
+from array import array
 
 def test_gen_table():
     seed(2)
@@ -67,3 +68,31 @@ def test_clipboard():
 
 
 
+def test_render_chunks():
+    t = HtmlTable(["S01", "S02"], [str(k) for k in range(5)])
+    t.add_row_unit_column(["degC"] * 5)
+    t.set_data([[k, nan] for k in range(5)])
+    table = t.render()
+    assert "&deg;C" in table and "°" not in table
+    assert "".join(t.iter_render(chunk_rows=2)) == table
+
+
+def test_set_columns():
+    t = HtmlTable(["a", "b"], ["1", "2", "3"])
+    t.set_col_format(1, "{x:.2f}")
+    t.set_data([[1.5, nan], [2, 3], [4, 5.5555]])
+    by_rows = t._data
+    t.set_columns([array("d", [1.5, 2, 4]), array("d", [nan, 3, 5.5555])])
+    assert t._data == by_rows == [["1.5", ""], ["2", "3.00"], ["4", "5.56"]]
+
+
+def test_render_tsv():
+    t = HtmlTable(["S01", "S02"], ["T", "p"])
+    t.add_row_unit_column(["degC", "bar"])
+    t.set_top_rect_headers([["Property", "Unit"]])
+    t.date = "today"
+    t.set_data([[1.5, nan], [2, 3]])
+    lines = t.render_tsv().splitlines()
+    assert lines[0] == "Simulation:\t"
+    assert lines[3:] == ["Property\tUnit\tS01\tS02",
+                         "T\t°C\t1.5\t", "p\tbar\t2\t3"]
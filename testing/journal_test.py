@@ -0,0 +1,124 @@
+from wxfrog.models.journal import (
+    Journal, compact, diff, patch, read_journal, OP_SET_PARAM, OP_CONVERGED,
+    OP_RENAME, OP_LIBRARY)
+from wxfrog.models.model import Model
+from wxfrog.models.scenarios import (
+    Scenario, SCENARIO_CURRENT, SCENARIO_DEFAULT)
+from wxfrog.utils import DataStructure, get_unit_registry
+
+Q = get_unit_registry().Quantity
+
+
+def set_param(name, path, value):
+    return {"op": OP_SET_PARAM, "scenario": name, "path": path,
+            "value": value, "modified": "2024-01-01T00:00:00+00:00"}
+
+
+def test_diff_patch(sample_structure):
+    new = sample_structure.copy_tree()
+    new.set(("Pump", "power"), Q(3, "MW"))
+    del new["Heater"]["Tube"]
+    changes = diff(sample_structure, new)
+    assert changes == [(("Pump", "power"), "3 MW"),
+                       (("Heater", "Tube", "U"), None),
+                       (("Heater", "Tube", "Re"), None),
+                       (("Heater", "Tube", "Pr"), None)]
+    patched = sample_structure.copy_tree()
+    patch(patched, changes)
+    assert patched == new
+
+
+def test_compact():
+    records = [set_param("a", ["x"], "1 m"),
+               {"op": OP_CONVERGED, "modified": "", "parameters": [],
+                "results": [[["r"], "1 W"], [["s"], "1 W"]]},
+               set_param("a", ["x"], "2 m"),
+               set_param("b", ["x"], "1 m"),
+               {"op": OP_RENAME, "source": "b", "target": "c"},
+               set_param("b", ["x"], "2 m"),
+               set_param("a", ["x"], "3 m"),
+               {"op": OP_CONVERGED, "modified": "", "parameters": [],
+                "results": [[["r"], "2 W"]]}]
+    result = compact(records)
+    assert [r["op"] for r in result] == [
+        OP_SET_PARAM, OP_RENAME, OP_SET_PARAM, OP_SET_PARAM, OP_CONVERGED]
+    assert result[0]["scenario"] == "b"
+    assert result[3]["value"] == "3 m"
+    assert result[4]["results"] == [[["r"], "2 W"], [["s"], "1 W"]]
+
+
+def test_journal_truncate(tmp_path):
+    path = str(tmp_path / "test.journal")
+    journal = Journal(path, threshold=3)
+    for k in range(3):
+        journal.append(set_param("a", ["x"], f"{k} m"))
+    mark = journal.mark()
+    journal.append(set_param("a", ["x"], "3 m"))  # compacted to one record
+    assert len(read_journal(path)) == 2
+    journal.truncate(mark)
+    assert read_journal(path) == [set_param("a", ["x"], "3 m")]
+
+
+def test_journal_compact_pending_save(tmp_path):
+    path = str(tmp_path / "test.journal")
+    journal = Journal(path, threshold=2)
+    journal.append({"op": OP_RENAME, "source": "a", "target": "b"})
+    journal.append(set_param("b", ["x"], "1 m"))
+    mark = journal.mark()  # the save is pending while compacting
+    for k in range(20):  # compacted several times
+        journal.append(set_param("c", ["x"], f"{k} m"))
+    journal.truncate(mark)
+    records = read_journal(path)
+    assert {r.get("scenario") for r in records} == {"c"}  # saved ones are gone
+    assert records[-1] == set_param("c", ["x"], "19 m")
+
+
+def test_model_recover(tmp_path):
+    path = str(tmp_path / "project.zip")
+    model = Model(None, None)
+    model.scenarios[SCENARIO_DEFAULT] = Scenario(DataStructure({"x": Q(1, "m")}))
+    model.save(path, [])
+    model.wait_for_save()
+    assert model.load(path) == []
+    model.copy_scenario(SCENARIO_DEFAULT, SCENARIO_CURRENT)
+    model.set_param(SCENARIO_CURRENT, ("x",), Q(2, "m"))
+    model.copy_scenario(SCENARIO_CURRENT, "custom")
+    model.rename_scenario("custom", "renamed")
+    model.delete_scenario(SCENARIO_DEFAULT)
+    # the process crashes here, and the lock of the journal is released
+    model._journal.close()
+
+    loaded = Model(None, None)
+    loaded.load(path)
+    assert loaded.recoverable_changes() == 5
+    loaded.recover()
+    assert set(loaded.scenarios) == {SCENARIO_CURRENT, "renamed"}
+    assert loaded.scenarios["renamed"].parameters["x"] == Q(2, "m")
+    loaded.save(path, [])
+    loaded.wait_for_save()
+    assert Model(None, None).load(path) == []
+    assert read_journal(f"{path}.journal") == []
+
+
+def test_journal_in_use(tmp_path):
+    stem = str(tmp_path / "project.zip")
+    first = Journal.open_free(stem)
+    first.append(set_param("a", ["x"], "1 m"))
+    second = Journal.open_free(stem)  # as by another running instance
+    assert second.path != first.path
+    second.clear()
+    second.close()
+    assert read_journal(first.path) == [set_param("a", ["x"], "1 m")]
+    first.close()  # as by a crash, leaving the records
+    assert Journal.open_free(stem).load() == [set_param("a", ["x"], "1 m")]
+
+
+def test_replay_library():
+    model = Model(None, None)  # no library available while recovering
+    scenario = Scenario(DataStructure({"x": Q(5, "m")}))
+    model._replay({"op": OP_LIBRARY, "source": "lib", "target": "imported",
+                   "scenario": scenario.serialize()})
+    assert model.scenarios["imported"].parameters["x"] == Q(5, "m")
+    # written by earlier versions without the data, so skipped
+    model._replay({"op": OP_LIBRARY, "source": "lib", "target": "other"})
+    assert "other" not in model.scenarios
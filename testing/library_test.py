@@ -0,0 +1,53 @@
+from datetime import datetime, UTC
+from threading import Thread
+
+from pytest import raises
+
+from wxfrog.models.library import ScenarioLibrary
+from wxfrog.models.scenarios import Scenario
+from wxfrog.utils import DataStructure, get_unit_registry
+
+Q = get_unit_registry().Quantity
+
+
+def scenario(temperature, pressure):
+    return Scenario(DataStructure({"feed": {"T": Q(temperature, "degC"),
+                                            "p": Q(pressure, "bar")}}))
+
+
+def test_library_find(tmp_path):
+    path = str(tmp_path / "library.sqlite")
+    library = ScenarioLibrary(path, [{"path": ["feed", "T"], "uom": "K"}])
+    for k in range(10):
+        library.store(f"case {k}", scenario(20 + 10 * k, 2))
+    assert len(library) == 10
+    found = library.find({("feed", "T"): (Q(40, "degC"), Q(60, "degC"))})
+    assert found == ["case 2", "case 3", "case 4"]
+    assert library.find(modified_after=datetime.now(UTC)) == []
+    with raises(KeyError):
+        library.find({("feed", "p"): (None, Q(3, "bar"))})
+
+    library.rename("case 2", "case 4")
+    library.delete("case 3")
+    found = library.find({("feed", "T"): (Q(40, "degC"), None)})
+    assert found[:2] == ["case 4", "case 5"]
+    assert library.load("case 4").parameters["feed"]["T"] == Q(40, "degC")
+    library.close()
+
+    # re-indexing when opened with other indexed parameters
+    library = ScenarioLibrary(path, [{"path": ["feed", "p"], "uom": "bar"}])
+    assert len(library.find({("feed", "p"): (Q(1, "bar"), None)})) == 8
+    library.close()
+
+
+def test_library_threads(tmp_path):
+    # opened in the initialisation thread, used in the GUI thread
+    path = str(tmp_path / "library.sqlite")
+    opened = []
+    thread = Thread(target=lambda: opened.append(ScenarioLibrary(path, [])))
+    thread.start()
+    thread.join()
+    library = opened[0]
+    library.store("case", scenario(20, 2))
+    assert [e.name for e in library.entries()] == ["case"]
+    library.close()
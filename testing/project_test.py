@@ -0,0 +1,109 @@
+from os import chmod, stat
+from zipfile import ZipFile
+
+from wxfrog.models.casestudy import CaseStudy, CaseStudyResults
+from wxfrog.models.model import Model
+from wxfrog.models.project import write_project, ProjectFile
+from wxfrog.models.scenarios import Scenario, SCENARIO_DEFAULT
+from wxfrog.utils import DataStructure, get_unit_registry
+
+Q = get_unit_registry().Quantity
+
+
+def test_write_project_copy_raw(tmp_path):
+    path = str(tmp_path / "project.zip")
+    write_project(path, {"a.json": '{"a": 1}', "b.json": '{"b": 2}'})
+    write_project(path, {"a.json": None, "c.json": '{"c": 3}'}, path)
+    project = ProjectFile(path)
+    assert project.members() == {"a.json", "c.json"}
+    assert project.read_json("a.json") == {"a": 1}
+    with ZipFile(path) as file:
+        assert file.testzip() is None
+
+
+def test_write_project_keeps_mode(tmp_path):
+    path = str(tmp_path / "project.zip")
+    write_project(path, {"a.json": '{"a": 1}'})
+    chmod(path, 0o644)
+    write_project(path, {"a.json": None}, path)
+    assert stat(path).st_mode & 0o777 == 0o644
+
+
+def test_model_incremental_save(tmp_path):
+    path = str(tmp_path / "project.zip")
+    model = Model(None, None)
+    model.scenarios[SCENARIO_DEFAULT] = Scenario(DataStructure(
+        {"a": {"x": Q(3, "m")}}))
+    model.scenarios["custom"] = Scenario(DataStructure({"b": Q(2, "bar")}))
+    model.save(path, [])
+    model.wait_for_save()
+    member = model.scenarios["custom"].member
+    assert not model.scenarios["custom"].dirty
+
+    model.scenarios[SCENARIO_DEFAULT].set_param(("a", "x"), Q(4, "m"))
+    model.save(path, [])
+    model.wait_for_save()
+    assert model.scenarios["custom"].member == member
+
+    loaded = Model(None, None)
+    assert loaded.load(path) == []
+    assert loaded.scenarios[SCENARIO_DEFAULT].parameters["a"]["x"] == Q(4, "m")
+    assert loaded.scenarios["custom"].parameters["b"] == Q(2, "bar")
+
+
+def test_model_lazy_load(tmp_path):
+    path, path_2 = str(tmp_path / "project.zip"), str(tmp_path / "copy.zip")
+    model = Model(None, None)
+    model.scenarios["custom"] = Scenario(DataStructure({"b": Q(2, "bar")}))
+    model.save(path, [])
+    model.wait_for_save()
+
+    loaded = Model(None, None)
+    loaded.load(path)
+    scenario = loaded.scenarios["custom"]
+    assert not scenario.has_results()
+    assert not scenario.dirty
+    loaded.save(path_2, [])  # copies the member without loading it
+    loaded.wait_for_save()
+
+    again = Model(None, None)
+    again.load(path_2)
+    assert again.scenarios["custom"].parameters["b"] == Q(2, "bar")
+    assert scenario.parameters["b"] == Q(2, "bar")
+
+
+def test_model_case_study_results(tmp_path, sample_structure):
+    path = str(tmp_path / "project.zip")
+    model = Model(None, None)
+    scenario = Scenario(DataStructure({"x": Q(3, "m")}))
+    model.scenarios["custom"] = scenario
+    case_study = model._case_study = CaseStudy(None, scenario, None)
+    case_study.results = CaseStudyResults([("x",)],
+                                          sample_structure.all_paths)
+    case_study.results.add_result(scenario.parameters, sample_structure)
+    model.save(path, [])
+    model.wait_for_save()
+    model.save(path, [])  # results copied as raw member
+    model.wait_for_save()
+
+    loaded = Model(None, None)
+    loaded.load(path)
+    results = loaded._case_study.results
+    assert results.num_rows == 1
+    assert list(results.params[0]) == [3.0]
+    assert float(results.results[0][0]) == 500.0
+
+
+def test_model_failed_save(tmp_path):
+    path = str(tmp_path / "project.zip")
+    model = Model(None, None)
+    model.scenarios["custom"] = Scenario(DataStructure({"b": Q(2, "bar")}))
+    model.save(path, [])
+    model.wait_for_save()
+    assert model.file_path == path
+
+    model.scenarios["custom"].set_param(("b",), Q(3, "bar"))
+    model.save(str(tmp_path / "missing" / "project.zip"), [])
+    model.wait_for_save()
+    assert model.file_path == path  # still pointing to the last good file
+    assert model.scenarios["custom"].dirty
@@ -0,0 +1,32 @@
+from wxfrog.models.resulttree import ResultTree
+from wxfrog.utils import get_unit_registry, get_path_table
+
+Q = get_unit_registry().Quantity
+
+
+def test_result_tree_update(sample_structure):
+    data = sample_structure.copy_tree()
+    tree = ResultTree()
+    assert tree.update(data) is None  # structure changed
+    pump = tree.root.children[1]
+    assert pump.path == ("Pump",) and not pump.is_leaf
+    power = pump.children[0]
+    assert power.is_leaf and power.parent is pump
+    assert power.id == get_path_table().id_of(("Pump", "power"))
+    assert tree.update(data) == []
+
+    data["Pump"]["power"] = Q(3, "MW")
+    data["Pump"]["efficiency"] = Q(87, "%")  # same value, new object
+    assert tree.update(data) == [power]
+    assert tree.root.children[1].children[0] is power  # stable node
+    assert power.value == Q(3, "MW")
+
+    data["Pump"]["power"] = Q(3000, "kW")
+    assert tree.refresh(data) == [power]
+
+    assert len(tree) == 13
+    del data["Heater"]
+    assert tree.update(data) is None
+    assert len(tree) == 3  # the nodes of the heater are dropped
+    assert tree.root.children == [pump]
+    assert [n.name for n in tree.leaves()] == ["power", "efficiency"]
@@ -0,0 +1,18 @@
+from wxfrog.models.spatial import GridIndex
+
+
+def test_grid_index():
+    index = GridIndex([((10, 10, 100, 20), "a"),
+                       ((50, 15, 30, 200), "b"),
+                       ((-40, -40, 20, 20), "c")], cell_size=32)
+    assert len(index) == 3
+    assert index.at(20, 20) == "a"
+    assert index.at(60, 20) == "a"  # first inserted wins
+    assert index.all_at(60, 20) == ["a", "b"]
+    assert index.at(60, 200) == "b"
+    assert index.at(110, 20) is None  # right edge is exclusive
+    assert index.at(-30, -30) == "c"
+    assert index.intersecting((0, 100, 200, 10)) == ["b"]
+    assert index.intersecting((-100, -100, 300, 300)) == ["a", "b", "c"]
+    index.build([])
+    assert index.at(20, 20) is None
@@ -1,4 +1,6 @@
-from wxfrog.utils import DataStructure, get_unit_registry
+from wxfrog.utils import (
+    DataStructure, PathFilter, get_unit_registry, get_path_table, fmt_unit,
+    format_unit, parse_unit)
 
 Q = get_unit_registry().Quantity
 
@@ -30,4 +32,58 @@ def test_from_jsonable():
 def test_all_paths(sample_structure):
     result = sample_structure.all_paths
     assert len(result) == 9
-    assert ('Heater', 'Tube', 'Re') in result
\ No newline at end of file
+    assert ('Heater', 'Tube', 'Re') in result
+
+def test_path_filter_matches():
+    f = PathFilter("Heater.**.U")
+    assert f.matches(("Heater", "Shell", "U"))
+    assert not f.matches(("Heater", "U"))
+    assert not f.matches(("Pump", "Shell", "U"))
+    assert PathFilter("**.Re").matches(("Heater", "Tube", "Re"))
+    assert PathFilter("Pu*.power").matches(("Pump", "power"))
+    assert PathFilter("").matches(("anything", "goes"))
+    # a partial double star stays within one element
+    assert PathFilter("**.po**r").matches(("Pump", "power"))
+    assert not PathFilter("Pu**r").matches(("Pump", "power"))
+
+
+def test_path_filter_apply(sample_structure):
+    result = PathFilter("Heater.*.U").apply(sample_structure)
+    assert set(result["Heater"]) == {"Shell", "Tube"}
+    assert "Pump" not in result
+    assert PathFilter("Valve.**").apply(sample_structure) is None
+
+
+def test_path_filter_narrows(sample_structure):
+    def narrows(term, previous):
+        return PathFilter(term).narrows(PathFilter(previous))
+
+    assert narrows("Heater.**", "")
+    assert narrows("Heater.**.U", "Heater.**")
+    assert narrows("Heater.Shell.U", "Heater.*.U")
+    assert narrows("Heater.*.U", "**.U")
+    assert not narrows("Heater.**", "Heater.*")
+    assert not narrows("**.Re", "**.R")
+    assert not narrows("", "**.U")
+    term, previous = "Heater.**.U", "Heater.**"
+    matches = PathFilter(previous).apply(sample_structure)
+    assert PathFilter(term).apply(matches) == \
+        PathFilter(term).apply(sample_structure)
+
+
+def test_path_table_interning(sample_structure):
+    table = get_path_table()
+    path = table.intern(["Heater", "Tube", "Re"])
+    assert path == ("Heater", "Tube", "Re")
+    assert any(p is path for p in sample_structure.all_paths)
+    assert table.path_of(table.id_of(("Heater", "Tube", "Re"))) is path
+
+def test_unit_cache():
+    assert parse_unit("degC") is parse_unit("degC")
+    assert format_unit("degC", "~P") == "°C"
+    assert format_unit(Q(1, "m/s").u, "~P") == "m/s"
+    assert fmt_unit("W/(m**2*K)") == "W/K/m²"
+    format_unit(parse_unit("degC"), "~P")
+    hits = format_unit.cache_info().hits
+    format_unit(Q(20, "degC").u, "~P")
+    assert format_unit.cache_info().hits == hits + 1